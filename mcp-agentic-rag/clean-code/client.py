@@ -4,6 +4,7 @@ import asyncio
 from typing import Optional, List
 from contextlib import AsyncExitStack
 import os
+import sys
 import json
 
 from mcp.client.stdio import stdio_client
@@ -12,9 +13,15 @@ from azure.core.credentials import AzureKeyCredential
 
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from mcp.shared.exceptions import McpError
 
 from dotenv import load_dotenv
 
+# rag_core lives one level up, next to mcp_server.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rag_core.deadline import Deadline, call_tool, partial_notice
+from rag_core.router import KeywordRouter, Speculation, SpeculationStats
 from utils import setup_logger as sl
 
 # Get the logger
@@ -32,6 +39,13 @@ class MCPClient:
         self.endpoint: str = os.getenv("MODEL_ENDPOINT")
         self.model_name: str = os.getenv("MODEL_DEPLOYMENT_NAME")
         self.context = []
+        # Speculative retrieval: start the likely tool call while the first LLM call runs
+        self.speculative: bool = os.getenv("SPECULATIVE_RETRIEVAL", "false").lower() in ("1", "true", "yes")
+        self.speculation_stats = SpeculationStats()
+        # One deadline per user query (seconds), sent with each of its tool calls; the tools
+        # must be done ANSWER_RESERVE seconds before it, leaving that for the final LLM call
+        self.query_deadline: float = float(os.getenv("QUERY_DEADLINE", "60"))
+        self.answer_reserve: float = float(os.getenv("ANSWER_RESERVE", "10"))
 
         # API auth
         self.client = ChatCompletionsClient(
@@ -75,11 +89,23 @@ class MCPClient:
         } for tool in response.tools]
 
 
+    def start_speculation(self, tools: List[dict], deadline: Deadline) -> Optional[Speculation]:
+        """Guess the tool locally and start calling it before the LLM has decided."""
+        router = KeywordRouter(available_tools=[tool["function"]["name"] for tool in tools])
+        prediction = router.predict(self.context[-1]["content"])
+        if prediction is None:
+            return None
+        name, args = prediction
+        logger.info(f"Speculatively calling {name}")
+        return Speculation(prediction, call_tool(self.session, name, args, deadline), self.speculation_stats)
+
     async def process_query(self) -> str:
         """
         Processing the query each call in the chat loop
         """
+        tool_deadline = Deadline.after(self.query_deadline).earlier(self.answer_reserve)
         tools = await self.listing_tools()
+        speculation = self.start_speculation(tools, tool_deadline) if self.speculative else None
 
         response = await self.client.complete(
             messages=self.context,
@@ -98,13 +124,24 @@ class MCPClient:
         if result.tool_calls:
             for tc in (response.choices[0].message.tool_calls or []):
                 args = json.loads(tc.function.arguments)
-                result = await self.session.call_tool(tc.function.name, args)
+                result = await speculation.take(tc.function.name, args) if speculation else None
+                if result is None:
+                    try:
+                        result = await call_tool(self.session, tc.function.name, args, tool_deadline)
+                    except McpError as e:
+                        # The server missed the deadline (or failed); answer without this tool
+                        logger.error(f"Tool call {tc.function.name} failed: {e}")
                 tool_msgs.append({
                     "role": "tool",
-                    "content": result.content[0].text,
+                    "content": result.content[0].text if result is not None
+                    else partial_notice([f"{tc.function.name} returned nothing"]),
                     "tool_call_id": tc.id
                 })
 
+        if speculation is not None:
+            speculation.close()
+            logger.info(str(self.speculation_stats))
+
         # Continue conversation
         self.context.extend(tool_msgs)
         # logger.debug(f"Conext built until now: {self.context}")
@@ -179,6 +216,8 @@ class MCPClient:
     async def cleanup(self):
         """Clean up resources"""
         logger.info("Clean up for the session, since chat ability is closed now")
+        if self.speculative:
+            logger.info(str(self.speculation_stats))
         await self.exit_stack.aclose()
 
 async def main():
@@ -198,5 +237,4 @@ async def main():
         logger.error(f"\nError: {str(e)}")
 
 if __name__ == "__main__":
-    import sys
     asyncio.run(main())
\ No newline at end of file
@@ -1,25 +1,107 @@
+import asyncio
+import functools
+import logging
 import os
-from typing import List
+import sys
+import threading
+from dataclasses import replace
+from typing import List, Optional
 import requests
-from bs4 import BeautifulSoup
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from qdrant_client import models, QdrantClient
 
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
 
+from rag_core.compression import compress_payloads, compress_texts
+from rag_core.deadline import Deadline, gather_until, partial_notice
+from rag_core.doc_store import OFFSET_FIELDS, hit_payloads, open_doc_store
+from rag_core.embedding_service import BULK, INTERACTIVE, open_embed_model
+from rag_core.fanout import compress_fan_out, fan_out_search, parse_collections
+from rag_core.firecrawl import FirecrawlClient
+from rag_core.passages import extract_passages, select_passages
+from rag_core.profiles import get_profile
+from rag_core.profiling import profiled
+from rag_core.qdrant_store import build_filter, get_store
+from rag_core.rate_limit import LimitConfig, RateController
+from rag_core.web_cache import WebCache
+
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Logs go to stderr, so they don't interfere with the stdio transport
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("mcp_server")
+
 # Configuration constants
 QDRANT_URL = os.getenv("QDRANT_URL")
 COLLECTION_NAME = "covid-faq"  # Using a new collection for the Python data
+COLLECTION_PROFILE = get_profile(os.getenv("COLLECTION_PROFILE"))  # sets the query-time HNSW ef
+# Collections searched together by knowledge_base_search_tool, "name[:timeout seconds],..."
+SEARCH_COLLECTIONS = parse_collections(
+    os.getenv("SEARCH_COLLECTIONS", "covid-faq,python-faq"),
+    default_timeout=float(os.getenv("SEARCH_COLLECTION_TIMEOUT", "2")),
+)
 EMBED_MODEL = "nomic-ai/nomic-embed-text-v1.5"
 HOST = os.getenv("HOST")
 PORT = os.getenv("PORT")
 url = os.getenv("FIRECRAWL_URL")
 api_key = os.getenv('FIRECRAWL_API_KEY')
+# When set, chunk text is read from this local store and Qdrant only returns IDs and scores
+DOC_STORE_PATH = os.getenv("DOC_STORE_PATH")
+doc_store = open_doc_store(DOC_STORE_PATH)
+# Token budgets for the context each tool hands back to the LLM
+FAQ_CONTEXT_TOKENS = int(os.getenv("FAQ_CONTEXT_TOKENS", "1500"))
+WEB_CONTEXT_TOKENS = int(os.getenv("WEB_CONTEXT_TOKENS", "2000"))
+# Characters of crawled page text the web tool picks, by relevance to the query
+WEB_CONTEXT_CHARS = int(os.getenv("WEB_CONTEXT_CHARS", "3000"))
+# Seconds a tool call may take when the client sends no deadline with it
+TOOL_DEADLINE = float(os.getenv("TOOL_DEADLINE", "60"))
+# With less time than this left, crawled passages are ranked by BM25 alone (no embedding)
+RERANK_MIN_SECONDS = 1.0
+
+# Outbound HTTP limits: per crawled domain (politeness), and for the Firecrawl API. Both
+# adapt their concurrency to 429s / 5xx and to responses slower than their latency target
+# (0 turns that off), and honour Retry-After, see rag_core/rate_limit.py
+web_limits = RateController(
+    default=LimitConfig(
+        rate=float(os.getenv("DOMAIN_RATE", "1")),
+        burst=2,
+        max_concurrency=int(os.getenv("DOMAIN_MAX_CONCURRENCY", "2")),
+        latency_target=float(os.getenv("DOMAIN_LATENCY_TARGET", "5")) or None,
+        max_retries=1,
+        max_retry_after=5.0,
+    ),
+    overrides={
+        "firecrawl": LimitConfig(
+            rate=float(os.getenv("FIRECRAWL_RATE", "5")),
+            burst=5,
+            max_concurrency=int(os.getenv("FIRECRAWL_MAX_CONCURRENCY", "4")),
+            latency_target=float(os.getenv("FIRECRAWL_LATENCY_TARGET", "15")) or None,
+        ),
+    },
+)
+page_session = requests.Session()
+
+# Concurrent identical searches share one Firecrawl call; results are cached briefly
+firecrawl = FirecrawlClient(
+    url,
+    api_key,
+    timeout=float(os.getenv("FIRECRAWL_TIMEOUT", "30")),
+    cache_ttl=float(os.getenv("FIRECRAWL_CACHE_TTL", "300")),
+    negative_ttl=float(os.getenv("FIRECRAWL_NEGATIVE_TTL", "10")),
+    rate=web_limits,
+)
+
+# Crawled passages are also written to a Qdrant collection and answer later, similar
+# questions while fresh (see rag_core/web_cache.py); WEB_CACHE_TTL=0 turns this off
+WEB_CACHE_TTL = float(os.getenv("WEB_CACHE_TTL", "86400"))
+web_cache = WebCache(
+    get_store(QDRANT_URL),
+    collection_name=os.getenv("WEB_CACHE_COLLECTION", "web-cache"),
+    ttl=WEB_CACHE_TTL,
+    min_score=float(os.getenv("WEB_CACHE_MIN_SCORE", "0.75")),
+    sweep_interval=float(os.getenv("WEB_CACHE_SWEEP_INTERVAL", "600")),
+) if WEB_CACHE_TTL > 0 else None
 
 # Create an MCP server instance
 mcp_server = FastMCP("MCP-RAG-app",
@@ -28,12 +110,73 @@ mcp_server = FastMCP("MCP-RAG-app",
                      timeout=300)
 
 
+def current_request_id() -> str:
+    """
+    MCP request ID of the tool call being handled. Tool calls are profiled (sampled) only
+    when PROFILE_DIR is set, see rag_core/profiling.py; the ID names the profile files.
+    """
+    return str(mcp_server.get_context().request_id)
+
+
+def request_deadline() -> Deadline:
+    """
+    Deadline of the tool call being handled: the one the client sent in the request's
+    `_meta` (see rag_core/deadline.py), else TOOL_DEADLINE seconds from now.
+    """
+    return Deadline.from_meta(mcp_server.get_context().request_context.meta, TOOL_DEADLINE)
+
+
+# lru_cache alone doesn't stop two worker threads from both loading the model on first use
+_embed_model_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _open_embed_model(priority: str):
+    return open_embed_model(EMBED_MODEL, priority=priority)
+
+
+def get_embed_model():
+    """
+    The embedding model, loaded on first use and shared by all tool calls. With
+    EMBEDDING_SOCKET set, a client of the shared embedding service (utils/embedding_sidecar.py)
+    instead of a model of our own.
+    """
+    with _embed_model_lock:
+        return _open_embed_model(INTERACTIVE)
+
+
+def get_bulk_embed_model():
+    """
+    Embedding model for background work (web cache writes). Through the embedding service
+    that is a bulk-priority client, so whole pages queue behind query embeddings and other
+    interactive work; without the service, the tools' own model.
+    """
+    if not os.getenv("EMBEDDING_SOCKET"):
+        return get_embed_model()
+    with _embed_model_lock:
+        return _open_embed_model(BULK)
+
+
+async def embed_query(query: str, budget: float):
+    """
+    Embedding of `query`, computed in a worker thread so the event loop keeps serving other
+    calls. Raises `asyncio.TimeoutError` if it isn't ready within `budget` seconds.
+    """
+    return await asyncio.wait_for(
+        asyncio.to_thread(lambda: get_embed_model().get_query_embedding(query)),
+        timeout=budget,
+    )
+
+
 # Note: tool is registered with decorator and doc_string provide information for the llm
 # to understand if this tool should be called based on what the user query has asked.
 # The MCP framework uses these type-hints to validate inputs and understand the data types the 
 # tool works with.
 @mcp_server.tool()
-def covid_faq_retrieval_tool(query: str) -> str:
+@profiled("covid_faq_retrieval_tool", request_id=current_request_id)
+async def covid_faq_retrieval_tool(query: str,
+                                   sources: Optional[List[str]] = None,
+                                   doc_types: Optional[List[str]] = None) -> str:
     """
     Retrieve the most relevant documents from the Covid FAQ collection. 
     Use this tool when the user asks about covid related questions. 
@@ -42,6 +185,8 @@ def covid_faq_retrieval_tool(query: str) -> str:
     
     Args:
         query (str): The user query to retrieve the most relevant documents.
+        sources (List[str], optional): Only search chunks from these source documents.
+        doc_types (List[str], optional): Only search chunks of these document types (e.g. "pdf").
         
     Returns:
         str: The most relevant documents retrieved from the vector DB.
@@ -49,26 +194,94 @@ def covid_faq_retrieval_tool(query: str) -> str:
     if not isinstance(query, str):
         raise TypeError("Query must be a string.")
     
+    deadline = request_deadline()
 
-    embed_model = HuggingFaceEmbedding(
-        model_name=EMBED_MODEL,
-        trust_remote_code=True
-    )
-    client = QdrantClient(url=QDRANT_URL, prefer_grpc=True)
-    query_embedding = embed_model.get_query_embedding(query)
+    try:
+        query_embedding = await embed_query(query, deadline.budget())
+    except asyncio.TimeoutError:
+        logger.warning("covid_faq_retrieval_tool ran out of time embedding the query")
+        return f"{partial_notice(['the query was not embedded in time'])} I couldn't find a relevant answer in my knowledge base."
 
-    # Search Qdrant for the most similar vectors
-    search_result = client.query_points(
-        collection_name=COLLECTION_NAME,
-        query=query_embedding,
-        with_payload=True,
-        limit=3,
-    ).points
+    # Search Qdrant for the most similar vectors, retries included within the deadline
+    try:
+        search_result = await get_store(QDRANT_URL).query(
+            COLLECTION_NAME,
+            query_embedding,
+            with_payload=True if doc_store is None else OFFSET_FIELDS,
+            limit=3,
+            query_filter=build_filter(sources=sources, doc_types=doc_types),
+            search_params=COLLECTION_PROFILE.search_params(),
+            budget=deadline.budget(),
+        )
+    except asyncio.TimeoutError:
+        logger.warning("covid_faq_retrieval_tool ran out of time searching Qdrant")
+        return f"{partial_notice(['the knowledge base search did not finish'])} I couldn't find a relevant answer in my knowledge base."
 
     if not search_result:
         return "I couldn't find a relevant answer in my knowledge base."
 
-    return " ".join([hit.payload["context"] for hit in search_result])
+    # Merge overlapping chunks, drop near-duplicates and trim to the token budget
+    contexts, report = compress_payloads(hit_payloads(search_result, doc_store), FAQ_CONTEXT_TOKENS)
+    logger.info(f"covid_faq_retrieval_tool {report}")
+    return " ".join(contexts)
+
+
+@mcp_server.tool()
+@profiled("knowledge_base_search_tool", request_id=current_request_id)
+async def knowledge_base_search_tool(query: str,
+                                     collections: Optional[List[str]] = None,
+                                     sources: Optional[List[str]] = None,
+                                     doc_types: Optional[List[str]] = None) -> str:
+    """
+    Search all configured knowledge bases (e.g. the Covid FAQ and the Python FAQ) at once.
+    Use this tool when it is unclear which knowledge base holds the answer, or the question
+    spans several of them.
+
+    Args:
+        query (str): The user query to retrieve the most relevant documents.
+        collections (List[str], optional): Only search these knowledge bases.
+        sources (List[str], optional): Only search chunks from these source documents.
+        doc_types (List[str], optional): Only search chunks of these document types (e.g. "pdf").
+
+    Returns:
+        str: The most relevant passages, each labelled with the knowledge base and source it came from.
+    """
+    if not isinstance(query, str):
+        raise TypeError("Query must be a string.")
+
+    deadline = request_deadline()
+    # Embedded once, then every collection is searched concurrently
+    try:
+        query_embedding = await embed_query(query, deadline.budget())
+    except asyncio.TimeoutError:
+        logger.warning("knowledge_base_search_tool ran out of time embedding the query")
+        return f"{partial_notice(['the query was not embedded in time'])} I couldn't find a relevant answer in my knowledge base."
+
+    # No collection may take longer than the time left
+    targets = [
+        replace(t, timeout=deadline.budget(cap=t.timeout))
+        for t in SEARCH_COLLECTIONS if collections is None or t.name in collections
+    ]
+    result = await fan_out_search(
+        get_store(QDRANT_URL),
+        targets,
+        query_embedding,
+        limit=5,
+        query_filter=build_filter(sources=sources, doc_types=doc_types),
+        profile=COLLECTION_PROFILE,
+        doc_store=doc_store,
+    )
+    logger.info(f"knowledge_base_search_tool {result}")
+
+    if not result.hits:
+        return "I couldn't find a relevant answer in my knowledge base."
+
+    contexts, report = compress_fan_out(result, FAQ_CONTEXT_TOKENS)
+    logger.info(f"knowledge_base_search_tool {report}")
+    if result.timed_out:
+        # Timed-out collections are left out of the answer, say so
+        contexts.insert(0, partial_notice([f"{', '.join(result.timed_out)} did not answer in time"]))
+    return "\n\n".join(contexts)
 
 
 """
@@ -76,24 +289,24 @@ We’ll equip our agent with a second tool that uses the FireCrawl API to perfor
 web search. This gives our agent a way to find real-time, public information, making it 
 vastly more versatile.
 """
-def crawl_and_extract_text(target_url: str) -> str:
+def crawl_and_extract_passages(target_url: str, budget: Optional[float] = None) -> List[str]:
     try:
-        r = requests.get(target_url, timeout=10)
+        r = web_limits.request(page_session, "GET", target_url, timeout=10, budget=budget)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
-
-        # Remove script and style elements
-        for tag in soup(["script", "style", "noscript"]):
-            tag.decompose()
-
-        text = soup.get_text(separator=' ', strip=True)
-        return text[:600] 
+        # Visible text split into passages, without navigation, banners and other page chrome
+        return extract_passages(r.text)
+    except requests.exceptions.Timeout as e:
+        # The caller counts the page as not fetched in time
+        logger.warning(f"Timed out fetching {target_url}: {e}")
+        raise
     except Exception as e:
-        return f"Error fetching {target_url}: {e}"
+        logger.warning(f"Error fetching {target_url}: {e}")
+        return []
 
 
 @mcp_server.tool()
-def firecrawl_web_search_tool(query: str) -> List[str]:
+@profiled("firecrawl_web_search_tool", request_id=current_request_id)
+async def firecrawl_web_search_tool(query: str) -> List[str]:
     """
     Search for information on a given topic using Firecrawl.
     Use this tool when the user asks a specific question not related to the Covid.
@@ -107,35 +320,88 @@ def firecrawl_web_search_tool(query: str) -> List[str]:
     if not isinstance(query, str):
         raise TypeError("Query must be a string.")
 
-    payload = {"query": query, "timeout": 60000}
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    # Every stage below gets a share of the time left before the client's deadline; what
+    # doesn't fit is left out and listed in `cut_short`
+    deadline = request_deadline()
+    cut_short = []
 
+    # Without the embedding (in time, or at all) the cache is skipped and the crawl goes
+    # ahead; web search works without the embedding model
+    query_embedding = None
     try:
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        results = response.json().get("data", [])
-    except requests.exceptions.RequestException as e:
-        print(f"Error connecting to Firecrawl API: {e}")
-        results = []
-    finally:
-        extracted_result = []
-        for item in results:
-            page_url = item.get("url")
-
-            if not page_url:
-                continue
-
-            extracted_text = crawl_and_extract_text(page_url)
-            extracted_result.append(f"{extracted_text}...")
-
-        return extracted_result if extracted_text else ["I could not find any related information, please check from your own training data"]
+        query_embedding = await embed_query(query, deadline.budget(0.2))
+    except asyncio.TimeoutError:
+        if web_cache is not None:
+            cut_short.append("the web cache was not searched")
+    except Exception as e:
+        logger.warning(f"firecrawl_web_search_tool could not embed the query: {e!r}")
+    if web_cache is not None and query_embedding is not None:
+        cached = await web_cache.lookup(query_embedding, WEB_CONTEXT_CHARS, budget=deadline.budget(0.1, cap=1.0))
+        if cached:
+            extracted_result, report = compress_texts(
+                [f"[{passage.url}] {passage.text}" for passage in cached], WEB_CONTEXT_TOKENS
+            )
+            logger.info(f"firecrawl_web_search_tool answered from the web cache {report}; cache {web_cache.stats}")
+            return extracted_result
+
+    results = []
+    try:
+        results = await firecrawl.search(query, budget=deadline.budget(0.4))
+    except (requests.exceptions.RequestException, ValueError) as e:
+        # Unreachable, failing or answering garbage: carry on without search results
+        logger.warning(f"Error connecting to Firecrawl API: {e}")
+        if isinstance(e, requests.exceptions.Timeout):
+            cut_short.append("the web search did not finish")
+    page_urls = [item.get("url") for item in results if item.get("url")]
+    # Pages are fetched concurrently; web_limits keeps each domain to its own rate. Pages
+    # not fetched within their share of the time are dropped
+    page_budget = deadline.budget(0.6)
+    page_passages, late_pages = await gather_until(
+        [asyncio.to_thread(crawl_and_extract_passages, page_url, page_budget) for page_url in page_urls],
+        timeout=page_budget,
+        default=[],
+    )
+    if late_pages:
+        cut_short.append(f"{late_pages} of {len(page_urls)} pages not fetched")
+    if web_cache is not None:
+        # Written while we answer; the next similar question can skip the crawl
+        web_cache.put_in_background(dict(zip(page_urls, page_passages)), get_bulk_embed_model())
+    # Best passages for the query across all pages: BM25 first, then one batched
+    # embedding call for the top candidates if there is time for it
+    pages = dict(zip(page_urls, page_passages))
+    selected = None
+    if deadline.remaining() >= RERANK_MIN_SECONDS:
+        try:
+            selected = await asyncio.wait_for(
+                asyncio.to_thread(
+                    lambda: select_passages(
+                        query, pages, get_embed_model(), char_budget=WEB_CONTEXT_CHARS, query_vector=query_embedding
+                    )
+                ),
+                timeout=deadline.budget(0.8),
+            )
+        except asyncio.TimeoutError:
+            logger.warning("firecrawl_web_search_tool ran out of time re-ranking passages")
+            cut_short.append("passages ranked by keyword match only")
+        except Exception as e:
+            logger.warning(f"firecrawl_web_search_tool re-ranking failed, using keyword match only: {e!r}")
+    elif any(page_passages):
+        cut_short.append("passages ranked by keyword match only")
+    if selected is None:
+        selected = await asyncio.to_thread(select_passages, query, pages, None, char_budget=WEB_CONTEXT_CHARS)
+    extracted_result = [f"[{passage.url}] {passage.text}" for passage in selected]
+
+    # Pages are often boilerplate or near-copies of each other
+    extracted_result, report = compress_texts(extracted_result, WEB_CONTEXT_TOKENS)
+    logger.info(f"firecrawl_web_search_tool {report}; search calls {firecrawl.stats()}; limits {web_limits.stats()}")
+    if not extracted_result:
+        extracted_result = ["I could not find any related information, please check from your own training data"]
+    return [partial_notice(cut_short)] + extracted_result if cut_short else extracted_result
     
 
 if __name__ == "__main__":
-    # Start the MCP server
-    print(f"Starting MCP server at http://{HOST}:{PORT}")
-    # mcp_server.run(transport="sse")
-    mcp_server.run(transport="stdio")
\ No newline at end of file
+    # Start the MCP server; MCP_TRANSPORT=streamable-http (or sse) serves HTTP on HOST:PORT
+    transport = os.getenv("MCP_TRANSPORT", "stdio")
+    # stdout belongs to the protocol in stdio mode
+    print(f"Starting MCP server ({transport}) at http://{HOST}:{PORT}", file=sys.stderr)
+    mcp_server.run(transport=transport)
\ No newline at end of file
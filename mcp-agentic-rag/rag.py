@@ -1,10 +1,16 @@
 import uuid
+from datetime import date
 from itertools import islice
-from typing import List, Dict, Any, Generator
+from typing import List, Dict, Any, Generator, Optional
 
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from tqdm import tqdm
-from qdrant_client import models, QdrantClient
+from qdrant_client import models
+
+from rag_core.batching import BucketedEmbedder
+from rag_core.doc_store import hit_payloads, open_doc_store
+from rag_core.embedding_service import BULK, open_embed_model
+from rag_core.profiles import get_profile
+from rag_core.qdrant_store import build_filter, get_store, run_sync
 
 PYTHON_FAQ_TEXT = """
 Question: What is the difference between a list and a tuple in Python?
@@ -52,23 +58,29 @@ class FAQEngine:
     def __init__(self,
                  qdrant_url: str = "http://localhost:6333",
                  collection_name: str = "python-faq",
-                 embed_model_name: str = "nomic-ai/nomic-embed-text-v1.5"):
+                 embed_model_name: str = "nomic-ai/nomic-embed-text-v1.5",
+                 doc_store_path: Optional[str] = None,
+                 profile: str = "ram"):
         
         self.collection_name = collection_name
+        # Index/storage profile (ram | disk | bulk), also sets the query-time HNSW ef
+        self.profile = get_profile(profile)
+        # Optional local store for the Q&A text; Qdrant then only keeps vectors
+        self.doc_store = open_doc_store(doc_store_path)
         
         # Initialize the embedding model
         print("Loading embedding model...")
-        self.embed_model = HuggingFaceEmbedding(
-            model_name=embed_model_name,
-            trust_remote_code=True
-        )
+        # Texts are embedded in batches of similar length, sized by a token budget. With
+        # EMBEDDING_SOCKET set, through the shared embedding service, where loading the FAQ is
+        # bulk work and queries keep priority
+        self.embed_model = BucketedEmbedder(open_embed_model(embed_model_name, priority=BULK))
         
         # Dynamically get the vector dimension from the model
         self.vector_dim = len(self.embed_model.get_text_embedding("test"))
         print(f"Embedding model loaded. Vector dimension: {self.vector_dim}")
 
-        # Initialize the Qdrant client
-        self.client = QdrantClient(url=qdrant_url, prefer_grpc=True)
+        # Shared, pooled Qdrant access (async client driven from a background loop)
+        self.store = get_store(qdrant_url)
         print("Connected to Qdrant.")
 
     @staticmethod
@@ -79,80 +91,91 @@ class FAQEngine:
             for qa in text.strip().split("\n\n")
         ]
 
-    def setup_collection(self, faq_contexts: List[str], batch_size: int = 64):
+    def setup_collection(self, faq_contexts: List[str], batch_size: int = 64, source: Optional[str] = None):
         """
         Creates a Qdrant collection (if it doesn't exist) and ingests the FAQ data.
+        `source` (default: the collection name) is what `answer_question(sources=...)` matches.
         """
         # Check if collection exists, create if not
-        try:
-            self.client.get_collection(collection_name=self.collection_name)
+        # Upload with HNSW disabled, the graph is built once at the end
+        created = run_sync(self.store.ensure_collection(
+            self.collection_name, self.vector_dim, distance=models.Distance.DOT, profile=self.profile.bulk()
+        ))
+        if created:
+            print(f"Created collection '{self.collection_name}'.")
+        else:
             print(f"Collection '{self.collection_name}' already exists. Skipping creation.")
-        except Exception:
-            print(f"Creating collection '{self.collection_name}'...")
-            self.client.create_collection(
-                collection_name=self.collection_name,
-                vectors_config=models.VectorParams(
-                    size=self.vector_dim,
-                    distance=models.Distance.DOT
-                )
-            )
+        run_sync(self.store.ensure_payload_indexes(self.collection_name))
 
         print(f"Embedding and ingesting {len(faq_contexts)} documents...")
+        source = source or self.collection_name
+        # Kept in the payload with or without a doc store, the filters run in Qdrant
+        metadata = {"source": source, "doc_type": "faq", "ingest_date": date.today().isoformat()}
+
+        # 1. Get embeddings for everything at once, so short and long Q&As aren't padded together
+        all_embeddings = self.embed_model.get_text_embedding_batch(faq_contexts, show_progress_bar=False)
+        print(f"Embedding: {self.embed_model.stats}")
         
         # Process data in batches
-        for batch in tqdm(batch_generator(faq_contexts, batch_size), 
-                          total=(len(faq_contexts) // batch_size) + 1,
-                          desc="Ingesting FAQ data"):
-            
-            # 1. Get embeddings for the batch
-            embeddings = self.embed_model.get_text_embedding_batch(batch, show_progress_bar=False)
+        for batch, embeddings in tqdm(zip(batch_generator(faq_contexts, batch_size),
+                                          batch_generator(all_embeddings, batch_size)),
+                                      total=(len(faq_contexts) // batch_size) + 1,
+                                      desc="Ingesting FAQ data"):
             
             # 2. Create Qdrant points with unique IDs and payloads
+            ids = [str(uuid.uuid4()) for _ in batch]  # Generate a unique ID for each point
+            if self.doc_store is not None:
+                self.doc_store.put_many((point_id, context, source) for point_id, context in zip(ids, batch))
             points = [
                 models.PointStruct(
-                    id=str(uuid.uuid4()),  # Generate a unique ID for each point
+                    id=point_id,
                     vector=vector,
-                    payload={"context": context}
+                    payload=metadata if self.doc_store is not None else {"context": context, **metadata}
                 )
-                for context, vector in zip(batch, embeddings)
+                for point_id, context, vector in zip(ids, batch, embeddings)
             ]
             
             # 3. Upload points to the collection
-            self.client.upload_points(
-                collection_name=self.collection_name,
-                points=points,
+            run_sync(self.store.upsert(
+                self.collection_name,
+                points,
                 wait=False # Asynchronous upload for speed
-            )
+            ))
             
         print("Data ingestion complete.")
-        print("Updating collection indexing threshold...")
-        self.client.update_collection(
-            collection_name=self.collection_name,
-            optimizer_config=models.OptimizersConfigDiff(indexing_threshold=20000)
-        )
+        print("Building the collection index...")
+        run_sync(self.store.finalize_collection(self.collection_name, self.profile))
         print("Collection setup is finished.")
 
-    def answer_question(self, query: str, top_k: int = 3) -> str:
+    def answer_question(self,
+                        query: str,
+                        top_k: int = 3,
+                        sources: Optional[List[str]] = None,
+                        doc_types: Optional[List[str]] = None) -> str:
         """
         Searches the vector database for a given query and returns the most relevant contexts.
+        `sources` / `doc_types` restrict the search to matching payloads (indexed filtered search).
         """
         # 1. Create an embedding for the user's query
         query_embedding = self.embed_model.get_query_embedding(query)
 
         # 2. Search Qdrant for the most similar vectors
-        search_result = self.client.search(
-            collection_name=self.collection_name,
-            query_vector=query_embedding,
+        search_result = run_sync(self.store.query(
+            self.collection_name,
+            query_embedding,
             limit=top_k,
-            score_threshold=0.5
-        )
+            score_threshold=0.5,
+            with_payload=self.doc_store is None,
+            query_filter=build_filter(sources=sources, doc_types=doc_types),
+            search_params=self.profile.search_params()
+        ))
 
         # 3. Format the results into a single string
         if not search_result:
             return "I couldn't find a relevant answer in my knowledge base."
 
         relevant_contexts = [
-            hit.payload["context"] for hit in search_result
+            payload["context"] for payload in hit_payloads(search_result, self.doc_store)
         ]
         
         # Combine the contexts into a final, readable output
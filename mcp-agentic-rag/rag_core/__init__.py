@@ -0,0 +1,6 @@
+"""
+Shared building blocks for the MCP RAG app.
+
+The MCP servers, the FAQEngine and the scripts under utils/ import from here so that
+they all talk to Qdrant (and the rest of the retrieval stack) the same way.
+"""
@@ -0,0 +1,112 @@
+"""
+Length-bucketed batching for embedding.
+
+A transformer batch is padded to its longest input, so feeding chunks in corpus order
+wastes most of the compute whenever a few long chunks land among short ones. The
+`BucketedEmbedder` sorts inputs by token length, cuts the sorted list into batches whose
+padded size (batch size x longest input) fits a token budget, embeds them and puts the
+vectors back in input order. The budget also bounds activation memory per forward pass,
+which a fixed batch count does not.
+
+Lengths are counted with the tiktoken encoding used elsewhere in rag_core; it only has
+to rank inputs and roughly size batches, so it needn't match the model's tokenizer.
+"""
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence
+
+from rag_core.compression import count_tokens
+
+DEFAULT_TOKEN_BUDGET = 8192
+DEFAULT_MAX_BATCH_SIZE = 128
+
+
+@dataclass
+class BatchingStats:
+    texts: int = 0
+    batches: int = 0
+    tokens: int = 0
+    padded_tokens: int = 0
+
+    @property
+    def padding_efficiency(self) -> float:
+        """Share of the computed (padded) tokens that were real input."""
+        return self.tokens / self.padded_tokens if self.padded_tokens else 1.0
+
+    def __str__(self) -> str:
+        return (f"{self.texts} texts in {self.batches} batches, {self.tokens} tokens "
+                f"padded to {self.padded_tokens} ({self.padding_efficiency:.0%} efficient)")
+
+
+def plan_batches(lengths: Sequence[int],
+                 token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE) -> List[List[int]]:
+    """
+    Group input indices into batches of similar length whose padded size stays within
+    `token_budget`. An input longer than the budget gets a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    for i in order:
+        # Sorted ascending, so the newest input is the longest in the batch
+        longest = max(lengths[i], 1)
+        if batch and ((len(batch) + 1) * longest > token_budget or len(batch) >= max_batch_size):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def padded_tokens(lengths: Sequence[int], batches: Sequence[Sequence[int]]) -> int:
+    return sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+
+
+class BucketedEmbedder:
+    """
+    Wraps an embedding model (anything with `get_text_embedding_batch`, e.g. llama-index's
+    `HuggingFaceEmbedding`) and embeds through length-bucketed, token-budgeted batches.
+    """
+    def __init__(self,
+                 embed_model,
+                 token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 length_fn: Optional[Callable[[str], int]] = None):
+        self.embed_model = embed_model
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.length_fn = length_fn or count_tokens
+        self.stats = BatchingStats()
+        # llama-index models split every call into `embed_batch_size` pieces (10 by default);
+        # let the planned batches through whole
+        if hasattr(embed_model, "embed_batch_size"):
+            embed_model.embed_batch_size = max_batch_size
+        # Inputs are truncated to the model's max length, so longer ones cost no more than that
+        self.max_length: Optional[int] = getattr(embed_model, "max_length", None)
+
+    def __getattr__(self, name):
+        # Everything else (get_query_embedding, ...) goes to the wrapped model
+        return getattr(self.embed_model, name)
+
+    def get_text_embedding_batch(self,
+                                 texts: Sequence[str],
+                                 lengths: Optional[Sequence[int]] = None,
+                                 **kwargs) -> List[List[float]]:
+        """Embeddings for `texts`, in the order given. Pass `lengths` if token counts are known."""
+        if lengths is None:
+            lengths = [self.length_fn(text) for text in texts]
+        if self.max_length:
+            lengths = [min(length, self.max_length) for length in lengths]
+        batches = plan_batches(lengths, self.token_budget, self.max_batch_size)
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        for batch in batches:
+            vectors = self.embed_model.get_text_embedding_batch([texts[i] for i in batch], **kwargs)
+            for i, vector in zip(batch, vectors):
+                embeddings[i] = vector
+
+        self.stats.texts += len(texts)
+        self.stats.batches += len(batches)
+        self.stats.tokens += sum(lengths)
+        self.stats.padded_tokens += padded_tokens(lengths, batches)
+        return embeddings
@@ -0,0 +1,105 @@
+"""
+Token-window chunker with character offsets.
+
+Each document is tokenized once (tiktoken, same `cl100k_base` encoding TokenTextSplitter
+uses by default). Chunks are windows of `chunk_size` tokens over that token array with
+`chunk_overlap` tokens of overlap. When a sentence ends in the second half of a window the
+chunk is cut there instead, so chunks tend to end on full sentences.
+
+Every chunk keeps its character span in the source text (`char_start`, `char_end`), which
+is stored in the payload for highlighting and dedup.
+"""
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import tiktoken
+
+DEFAULT_ENCODING = "cl100k_base"
+SENTENCE_ENDINGS = ".!?\n"
+
+
+@dataclass(frozen=True)
+class Chunk:
+    text: str
+    char_start: int
+    char_end: int
+    token_start: int
+    token_end: int
+
+
+class Chunker:
+    """
+    Splits text into overlapping token windows that prefer sentence boundaries.
+    Picklable, so it can be shipped to loader worker processes.
+    """
+    def __init__(self,
+                 chunk_size: int = 200,
+                 chunk_overlap: int = 30,
+                 encoding: str = DEFAULT_ENCODING,
+                 min_sentence_fraction: float = 0.5):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size.")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.encoding = encoding
+        # A sentence boundary is only used if the chunk keeps at least this share of the window
+        self.min_sentence_fraction = min_sentence_fraction
+        self._enc = None
+
+    @property
+    def enc(self) -> tiktoken.Encoding:
+        if self._enc is None:
+            self._enc = tiktoken.get_encoding(self.encoding)
+        return self._enc
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_enc"] = None
+        return state
+
+    def chunk(self, text: str) -> List[Chunk]:
+        tokens = self.enc.encode_ordinary(text)
+        if not tokens:
+            return []
+        # Decoding once gives the start offset of every token in the text
+        text, starts = self.enc.decode_with_offsets(tokens)
+        n = len(tokens)
+        ends = starts[1:] + [len(text)]
+
+        # Token indices after which a sentence ends
+        boundaries = [
+            i for i, end in enumerate(ends)
+            if end > 0 and text[end - 1] in SENTENCE_ENDINGS and (end == len(text) or text[end].isspace())
+        ]
+        min_len = int(self.chunk_size * self.min_sentence_fraction)
+
+        chunks = []
+        start = 0
+        while start < n:
+            end = min(start + self.chunk_size, n)
+            if end < n:
+                i = bisect_right(boundaries, end - 1) - 1
+                if i >= 0 and boundaries[i] + 1 - start >= min_len:
+                    end = boundaries[i] + 1
+
+            char_start, char_end = starts[start], ends[end - 1]
+            piece = text[char_start:char_end]
+            stripped = piece.lstrip()
+            char_start += len(piece) - len(stripped)
+            stripped = stripped.rstrip()
+            if stripped:
+                chunks.append(Chunk(stripped, char_start, char_start + len(stripped), start, end))
+
+            if end == n:
+                break
+            start = max(end - self.chunk_overlap, start + 1)
+        return chunks
+
+    def chunk_many(self, texts: Sequence[str], workers: Optional[int] = None) -> List[List[Chunk]]:
+        """Chunk many documents in parallel, preserving input order."""
+        if workers == 1 or len(texts) < 2:
+            return [self.chunk(text) for text in texts]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(self.chunk, texts, chunksize=max(1, len(texts) // 64)))
@@ -0,0 +1,189 @@
+"""
+Post-retrieval context compression.
+
+Runs on retrieved passages before they are handed to the LLM:
+
+1. merge overlapping/adjacent chunks of the same source (using the `char_start` /
+   `char_end` payload offsets, or a word-level suffix/prefix match when there are none),
+2. drop near-duplicate passages (MinHash over word shingles),
+3. trim the result to a token budget, keeping passages in rank order.
+
+`compress` returns the kept passages with a `CompressionReport` so callers can log how
+many prompt tokens were saved.
+"""
+import logging
+import zlib
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+TOKEN_ENCODING = "cl100k_base"
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+NEAR_DUPLICATE_THRESHOLD = 0.8
+MIN_WORD_OVERLAP = 5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = np.random.default_rng(1)
+_PERM_A = _rng.integers(1, _MERSENNE_PRIME, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _MERSENNE_PRIME, NUM_PERM, dtype=np.uint64)
+
+_encoding: Optional[tiktoken.Encoding] = None
+
+
+def _enc() -> tiktoken.Encoding:
+    global _encoding
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    return len(_enc().encode_ordinary(text))
+
+
+@dataclass(frozen=True)
+class Passage:
+    text: str
+    source: Optional[str] = None
+    char_start: Optional[int] = None
+    char_end: Optional[int] = None
+    # Caller's handle on where the passage came from (e.g. a hit index); a merged passage
+    # keeps the one of its best-ranked part
+    ref: Any = None
+
+
+@dataclass
+class CompressionReport:
+    tokens_in: int = 0
+    tokens_out: int = 0
+    merged: int = 0
+    duplicates_dropped: int = 0
+    truncated: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_in - self.tokens_out
+
+    def __str__(self) -> str:
+        return (f"context {self.tokens_in} -> {self.tokens_out} tokens "
+                f"(saved {self.tokens_saved}; merged {self.merged}, "
+                f"dropped {self.duplicates_dropped} near-duplicates, truncated {self.truncated})")
+
+
+def _word_overlap(a: str, b: str) -> int:
+    """Number of words at the end of `a` that `b` starts with (0 if below MIN_WORD_OVERLAP)."""
+    a_words, b_words = a.split(), b.split()
+    for n in range(min(len(a_words), len(b_words)), MIN_WORD_OVERLAP - 1, -1):
+        if a_words[-n:] == b_words[:n]:
+            return n
+    return 0
+
+
+def _merge_pair(a: Passage, b: Passage) -> Optional[Passage]:
+    """Merge two passages if they overlap or touch in the same source, else None."""
+    if a.source is not None and a.source != b.source:
+        return None
+    if None not in (a.char_start, a.char_end, b.char_start, b.char_end):
+        first, second = (a, b) if a.char_start <= b.char_start else (b, a)
+        if second.char_start > first.char_end + 1:
+            return None
+        if second.char_end <= first.char_end:
+            return first
+        overlap = first.char_end - second.char_start
+        tail = second.text[overlap:] if overlap > 0 else " " + second.text
+        return replace(first, text=first.text + tail, char_end=second.char_end)
+    for first, second in ((a, b), (b, a)):
+        n = _word_overlap(first.text, second.text)
+        if n:
+            return replace(first, text=" ".join(first.text.split() + second.text.split()[n:]),
+                           char_start=None, char_end=None)
+    return None
+
+
+def merge_overlapping(passages: Sequence[Passage]) -> Tuple[List[Passage], int]:
+    """Merge overlapping chunks, keeping each merged passage at its best rank."""
+    merged: List[Passage] = []
+    count = 0
+    for passage in passages:
+        for i, kept in enumerate(merged):
+            combined = _merge_pair(kept, passage)
+            if combined is not None:
+                merged[i] = replace(combined, ref=kept.ref)
+                count += 1
+                break
+        else:
+            merged.append(passage)
+    return merged, count
+
+
+def _minhash(text: str) -> np.ndarray:
+    words = text.lower().split()
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64)
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME
+    return permuted.min(axis=0)
+
+
+def drop_near_duplicates(passages: Sequence[Passage],
+                         threshold: float = NEAR_DUPLICATE_THRESHOLD) -> Tuple[List[Passage], int]:
+    """Keep the first (best ranked) of every group of passages with estimated Jaccard >= threshold."""
+    kept: List[Passage] = []
+    signatures: List[np.ndarray] = []
+    for passage in passages:
+        signature = _minhash(passage.text)
+        if any(np.mean(signature == other) >= threshold for other in signatures):
+            continue
+        kept.append(passage)
+        signatures.append(signature)
+    return kept, len(passages) - len(kept)
+
+
+def compress(passages: Sequence[Passage], token_budget: int) -> Tuple[List[Passage], CompressionReport]:
+    """Merge, dedup and trim `passages` (in rank order) to at most `token_budget` tokens."""
+    report = CompressionReport(tokens_in=sum(count_tokens(p.text) for p in passages))
+    merged, report.merged = merge_overlapping(passages)
+    unique, report.duplicates_dropped = drop_near_duplicates(merged)
+
+    result: List[Passage] = []
+    remaining = token_budget
+    for passage in unique:
+        tokens = _enc().encode_ordinary(passage.text)
+        if len(tokens) > remaining:
+            if remaining > 0:
+                result.append(replace(passage, text=_enc().decode(tokens[:remaining]), char_end=None))
+                report.truncated += 1
+                remaining = 0
+            else:
+                report.truncated += 1
+            continue
+        result.append(passage)
+        remaining -= len(tokens)
+
+    report.tokens_out = token_budget - remaining
+    return result, report
+
+
+def compress_texts(texts: Sequence[str], token_budget: int) -> Tuple[List[str], CompressionReport]:
+    """`compress` for plain strings (e.g. web search results)."""
+    passages, report = compress([Passage(text) for text in texts], token_budget)
+    return [p.text for p in passages], report
+
+
+def compress_payloads(payloads: Sequence[Dict], token_budget: int) -> Tuple[List[str], CompressionReport]:
+    """`compress` for search-hit payloads carrying `context` and optional `source`/offsets."""
+    passages = [
+        Passage(
+            text=payload["context"],
+            source=payload.get("source"),
+            char_start=payload.get("char_start"),
+            char_end=payload.get("char_end"),
+        )
+        for payload in payloads
+    ]
+    kept, report = compress(passages, token_budget)
+    return [p.text for p in kept], report
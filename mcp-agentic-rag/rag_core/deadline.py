@@ -0,0 +1,107 @@
+"""
+End-to-end deadlines for a user query.
+
+The client sets one deadline per user query and sends it with every MCP tool call, in the
+request's `_meta` as `{"deadline": <epoch seconds>}`. That keeps it out of the tool
+arguments the LLM sees. A tool reads it back with `Deadline.from_meta`. Each stage
+(Firecrawl, page fetches, embedding, Qdrant) then gets only its share of the time that is
+left (`Deadline.budget`). A stage that runs out returns what it has, and the tool marks
+its answer as partial (`partial_notice`) instead of running on past the deadline.
+
+Deadlines are wall-clock times because they cross process boundaries; client and server
+are expected to share a clock (same host, or NTP).
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Awaitable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from mcp import ClientSession, types
+
+T = TypeVar("T")
+
+META_KEY = "deadline"
+
+
+@dataclass(frozen=True)
+class Deadline:
+    at: float  # epoch seconds
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.time() + seconds)
+
+    @classmethod
+    def from_meta(cls, meta: Any, default_seconds: float) -> "Deadline":
+        """Deadline from a request's `_meta`, or `default_seconds` from now if it has none."""
+        at = getattr(meta, META_KEY, None) if not isinstance(meta, dict) else meta.get(META_KEY)
+        try:
+            return cls(float(at))
+        except (TypeError, ValueError):
+            return cls.after(default_seconds)
+
+    def to_meta(self) -> Dict[str, float]:
+        return {META_KEY: self.at}
+
+    def earlier(self, seconds: float) -> "Deadline":
+        """This deadline moved `seconds` earlier, e.g. to keep time for the final LLM call."""
+        return Deadline(self.at - seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.time())
+
+    def expired(self) -> bool:
+        return self.remaining() == 0.0
+
+    def budget(self, share: float = 1.0, cap: Optional[float] = None) -> float:
+        """Seconds a stage may use: `share` of the remaining time, at most `cap`."""
+        seconds = self.remaining() * share
+        return seconds if cap is None else min(seconds, cap)
+
+
+def partial_notice(cut_short: Sequence[str]) -> str:
+    """First line of a tool result some stages of which ran out of time."""
+    return f"[Partial result, the time budget ran out: {'; '.join(cut_short)}]"
+
+
+async def gather_until(aws: Sequence[Awaitable[T]], timeout: float, default: T) -> Tuple[List[T], int]:
+    """
+    Results of `aws` in order, waiting at most `timeout` seconds. Those not done by then,
+    or that raised, give `default`; the second value counts them.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    if not tasks:
+        return [], 0
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    results, cut = [], 0
+    for task in tasks:
+        if task in done and task.exception() is None:
+            results.append(task.result())
+        else:
+            results.append(default)
+            cut += 1
+    return results, cut
+
+
+async def call_tool(session: ClientSession,
+                    name: str,
+                    arguments: Optional[Dict[str, Any]],
+                    deadline: Deadline,
+                    grace: float = 2.0) -> types.CallToolResult:
+    """
+    `session.call_tool` with `deadline` in the request's `_meta`. The client stops waiting
+    `grace` seconds after the deadline (raising `McpError`) if the server hasn't answered.
+    """
+    return await session.send_request(
+        types.ClientRequest(
+            types.CallToolRequest(
+                method="tools/call",
+                params=types.CallToolRequestParams(name=name, arguments=arguments, _meta=deadline.to_meta()),
+            )
+        ),
+        types.CallToolResult,
+        request_read_timeout_seconds=timedelta(seconds=deadline.remaining() + grace),
+    )
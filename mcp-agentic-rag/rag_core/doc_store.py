@@ -0,0 +1,106 @@
+"""
+Local document store for chunk text, keyed by Qdrant point ID.
+
+With a doc store in place, ingestion keeps only small metadata (e.g. `source`, still
+needed by the payload filters) in the Qdrant payload and writes the chunk text here
+instead. Searches then ask Qdrant for IDs, scores and chunk offsets only (`OFFSET_FIELDS`)
+and the text is assembled locally with one batched lookup. That keeps the text out of Qdrant's payload storage and off the wire.
+
+Text is stored zlib-compressed in a single sqlite table.
+"""
+import sqlite3
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+PointId = Union[str, int]
+
+# Payload fields still worth fetching from Qdrant when the text comes from the doc store
+OFFSET_FIELDS = ["source", "char_start", "char_end"]
+
+# sqlite's default limit on host parameters is 999 on older builds
+_LOOKUP_BATCH = 900
+
+
+class DocStore:
+    """
+    Compact sqlite store mapping point IDs to (text, source).
+    """
+    def __init__(self, path: str, compress_level: int = 6):
+        self.path = path
+        self.compress_level = compress_level
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " id TEXT PRIMARY KEY,"
+            " text BLOB NOT NULL,"
+            " source TEXT"
+            ") WITHOUT ROWID"
+        )
+        # Re-ingesting a document deletes its old rows by source
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source)")
+        self._conn.commit()
+
+    def put_many(self, items: Iterable[Tuple[PointId, str, Optional[str]]]):
+        """Insert or replace (point_id, text, source) rows in one transaction."""
+        rows = [
+            (str(point_id), zlib.compress(text.encode("utf-8"), self.compress_level), source)
+            for point_id, text, source in items
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def delete_sources(self, sources: Sequence[str]) -> int:
+        """Delete every row of the given source documents in one transaction; returns how many."""
+        deleted = 0
+        with self._lock:
+            for i in range(0, len(sources), _LOOKUP_BATCH):
+                batch = list(sources[i : i + _LOOKUP_BATCH])
+                placeholders = ",".join("?" * len(batch))
+                deleted += self._conn.execute(f"DELETE FROM chunks WHERE source IN ({placeholders})", batch).rowcount
+            self._conn.commit()
+        return deleted
+
+    def get_many(self, point_ids: Sequence[PointId]) -> Dict[str, Dict[str, Optional[str]]]:
+        """Batched lookup. Returns {point_id: {"context": text, "source": source}} for the IDs found."""
+        found = {}
+        keys = [str(point_id) for point_id in point_ids]
+        with self._lock:
+            for i in range(0, len(keys), _LOOKUP_BATCH):
+                batch = keys[i : i + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT id, text, source FROM chunks WHERE id IN ({placeholders})", batch
+                ).fetchall()
+                for point_id, blob, source in rows:
+                    found[point_id] = {"context": zlib.decompress(blob).decode("utf-8"), "source": source}
+        return found
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_doc_store(path: Optional[str]) -> Optional[DocStore]:
+    """DocStore for `path`, or None when the local store is not configured."""
+    return DocStore(path) if path else None
+
+
+def hit_payloads(hits, doc_store: Optional[DocStore] = None) -> List[Dict]:
+    """
+    Payloads for search hits, in hit order. Reads the Qdrant payload when there is no doc
+    store, otherwise resolves all hits with a single batched lookup and layers the text on
+    top of whatever (selected) payload fields Qdrant returned.
+    """
+    if doc_store is None:
+        return [hit.payload for hit in hits]
+    docs = doc_store.get_many([hit.id for hit in hits])
+    return [{**(hit.payload or {}), **docs[str(hit.id)]} for hit in hits if str(hit.id) in docs]
+
@@ -0,0 +1,340 @@
+"""
+Shared local embedding service (sidecar) over a Unix socket.
+
+Without it every MCP server process and every ingestion run loads its own copy of the
+embedding model. `EmbeddingService` holds one copy and serves all of them:
+
+- requests from every connected client are merged into shared batches, texts through the
+  length-bucketed `BucketedEmbedder`,
+- interactive work (query embeddings, the servers' requests) goes before bulk work
+  (ingestion); large requests are split into pieces of at most one batch, so an
+  interactive request never waits behind more than the batch already running,
+- the model runs on one thread at a time, with torch's thread pool pinned to the cores
+  given to `pin_to_cores`.
+
+`EmbeddingClient` has the embedding methods the app uses from llama-index's
+`HuggingFaceEmbedding` (`get_query_embedding`, `get_text_embedding`,
+`get_text_embedding_batch`), so it can stand in for it. `open_embed_model` returns a
+client when EMBEDDING_SOCKET is set and loads the model in-process otherwise.
+
+Wire format, both directions: a 4-byte big-endian length and a JSON header. A request
+header is `{"kind": "query"|"text", "priority": ..., "model": ..., "texts": [...]}`. A
+reply header is `{"count": n, "dim": d}` followed by n * d little-endian float32 values,
+or `{"error": "..."}`.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from rag_core.batching import BucketedEmbedder
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, BULK)
+QUERY = "query"
+TEXT = "text"
+
+DEFAULT_SOCKET = "/tmp/mcp-rag-embeddings.sock"
+_HEADER = struct.Struct(">I")
+
+
+def _pack(header: Dict, payload: bytes = b"") -> bytes:
+    body = json.dumps(header).encode()
+    return _HEADER.pack(len(body)) + body + payload
+
+
+def _recv_exactly(sock: socket.socket, n: int) -> bytes:
+    chunks = []
+    while n:
+        chunk = sock.recv(min(n, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Embedding service closed the connection")
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b"".join(chunks)
+
+
+class EmbeddingClient:
+    """
+    Embeds through the embedding service at `socket_path`. Thread-safe: every thread keeps
+    its own connection. Query embeddings are always sent as interactive work, text batches
+    with the client's `priority`.
+    """
+    def __init__(self,
+                 socket_path: str = DEFAULT_SOCKET,
+                 model_name: Optional[str] = None,
+                 priority: str = INTERACTIVE,
+                 timeout: float = 120.0):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {PRIORITIES}.")
+        self.socket_path = socket_path
+        # Checked by the service, so vectors from a different model can't be mixed in
+        self.model_name = model_name
+        self.priority = priority
+        self.timeout = timeout
+        # Texts per request; set by BucketedEmbedder like on a llama-index model
+        self.embed_batch_size = 256
+        self._local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _disconnect(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _request(self, kind: str, texts: Sequence[str], priority: str) -> np.ndarray:
+        message = _pack({"kind": kind, "priority": priority, "model": self.model_name, "texts": list(texts)})
+        for attempt in range(2):
+            try:
+                sock = self._connect()
+                sock.sendall(message)
+                (length,) = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+                header = json.loads(_recv_exactly(sock, length))
+                if "error" in header:
+                    raise RuntimeError(f"Embedding service error: {header['error']}")
+                count, dim = header["count"], header["dim"]
+                payload = _recv_exactly(sock, count * dim * 4)
+                return np.frombuffer(payload, dtype="<f4").reshape(count, dim)
+            except socket.timeout:
+                # A late reply would still arrive on this connection, so it can't be reused
+                self._disconnect()
+                raise
+            except ConnectionError:
+                # A stale connection (service restarted) is retried once on a new one
+                self._disconnect()
+                if attempt == 1:
+                    raise
+
+    def get_query_embedding(self, query: str) -> List[float]:
+        return self._request(QUERY, [query], INTERACTIVE)[0].tolist()
+
+    def get_text_embedding(self, text: str) -> List[float]:
+        return self._request(TEXT, [text], self.priority)[0].tolist()
+
+    def get_text_embedding_batch(self, texts: Sequence[str], show_progress_bar: bool = False, **kwargs) -> List[List[float]]:
+        embeddings: List[List[float]] = []
+        for start in range(0, len(texts), self.embed_batch_size):
+            embeddings.extend(self._request(TEXT, texts[start:start + self.embed_batch_size], self.priority).tolist())
+        return embeddings
+
+
+def open_embed_model(model_name: str, priority: str = INTERACTIVE, socket_path: Optional[str] = None):
+    """
+    `EmbeddingClient` for the service at `socket_path` (default: EMBEDDING_SOCKET) if one is
+    configured, else `model_name` loaded in this process.
+    """
+    socket_path = socket_path or os.getenv("EMBEDDING_SOCKET")
+    if socket_path:
+        return EmbeddingClient(socket_path, model_name=model_name, priority=priority)
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    return HuggingFaceEmbedding(model_name=model_name, trust_remote_code=True)
+
+
+def parse_cores(spec: str) -> List[int]:
+    """'0-3,6' -> [0, 1, 2, 3, 6]"""
+    cores = []
+    for part in spec.split(","):
+        first, _, last = part.strip().partition("-")
+        cores.extend(range(int(first), int(last or first) + 1))
+    return cores
+
+
+def pin_to_cores(cores: Sequence[int]):
+    """
+    Pin this process, and so every thread it starts from now on, to `cores`, and size
+    torch's intra-op thread pool to match. Call before the model is loaded.
+    """
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, set(cores))
+    else:
+        logger.warning("CPU affinity is not supported on this platform, threads are not pinned")
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(len(cores))
+
+
+def _embed_queries(embed_model, queries: List[str]) -> List[List[float]]:
+    # llama-index's HuggingFaceEmbedding batches with the query prompt in `_embed`; other
+    # models are asked one query at a time
+    if hasattr(embed_model, "_embed"):
+        return embed_model._embed(queries, prompt_name="query")
+    return [embed_model.get_query_embedding(query) for query in queries]
+
+
+@dataclass
+class _Job:
+    kind: str
+    count: int
+    future: asyncio.Future
+    parts: Dict[int, np.ndarray] = field(default_factory=dict)
+    pending: int = 0
+
+
+@dataclass
+class _Piece:
+    job: _Job
+    start: int
+    texts: List[str]
+
+
+class EmbeddingService:
+    """
+    Serves `embed_model` on a Unix socket, batching requests from all clients together.
+    `max_wait` is how long a batch that isn't full waits for other clients' requests.
+    """
+    def __init__(self,
+                 embed_model,
+                 socket_path: str = DEFAULT_SOCKET,
+                 model_name: Optional[str] = None,
+                 max_batch_size: int = 64,
+                 max_wait: float = 0.005,
+                 token_budget: int = 8192):
+        self.embed_model = embed_model
+        self.embedder = BucketedEmbedder(embed_model, token_budget=token_budget, max_batch_size=max_batch_size)
+        self.socket_path = socket_path
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queues: Dict[str, Deque[_Piece]] = {priority: deque() for priority in PRIORITIES}
+        # One batch at a time: the model has the pinned cores to itself
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="embed")
+        self._wakeup: Optional[asyncio.Event] = None
+        self.stats = {"requests": 0, "texts": 0, "batches": 0, "shared_batches": 0, "errors": 0}
+
+    async def submit(self, kind: str, texts: Sequence[str], priority: str = INTERACTIVE) -> np.ndarray:
+        """Embeddings of `texts` (one row each), once their turn in the shared batches comes."""
+        if kind not in (QUERY, TEXT):
+            raise ValueError(f"Unknown kind '{kind}'")
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'")
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        job = _Job(kind, len(texts), asyncio.get_running_loop().create_future())
+        for start in range(0, len(texts), self.max_batch_size):
+            self.queues[priority].append(_Piece(job, start, list(texts[start:start + self.max_batch_size])))
+            job.pending += 1
+        self.stats["requests"] += 1
+        self.stats["texts"] += len(texts)
+        self._wakeup.set()
+        return await job.future
+
+    def _queued_texts(self) -> int:
+        return sum(len(piece.texts) for queue in self.queues.values() for piece in queue)
+
+    def _next_batch(self) -> List[_Piece]:
+        """Interactive pieces first, bulk ones fill the rest; a batch holds one kind only."""
+        first = next(iter(self.queues[INTERACTIVE] or self.queues[BULK]))
+        batch, size = [], 0
+        for priority in PRIORITIES:
+            queue, keep = self.queues[priority], deque()
+            while queue:
+                piece = queue.popleft()
+                if piece.job.kind == first.job.kind and (not batch or size + len(piece.texts) <= self.max_batch_size):
+                    batch.append(piece)
+                    size += len(piece.texts)
+                else:
+                    keep.append(piece)
+            self.queues[priority] = keep
+        return batch
+
+    def _embed(self, kind: str, texts: List[str]) -> np.ndarray:
+        if kind == QUERY:
+            vectors = _embed_queries(self.embed_model, texts)
+        else:
+            vectors = self.embedder.get_text_embedding_batch(texts, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            if not self._queued_texts():
+                self._wakeup.clear()
+                continue
+            if self._queued_texts() < self.max_batch_size and self.max_wait:
+                # Give other clients' concurrent requests a moment to join the batch
+                await asyncio.sleep(self.max_wait)
+            batch = self._next_batch()
+            texts = [text for piece in batch for text in piece.texts]
+            self.stats["batches"] += 1
+            if len({id(piece.job) for piece in batch}) > 1:
+                self.stats["shared_batches"] += 1
+            try:
+                vectors = await loop.run_in_executor(self._executor, self._embed, batch[0].job.kind, texts)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.exception("Embedding batch failed")
+                for piece in batch:
+                    if not piece.job.future.done():
+                        piece.job.future.set_exception(e)
+                continue
+            offset = 0
+            for piece in batch:
+                job = piece.job
+                job.parts[piece.start] = vectors[offset:offset + len(piece.texts)]
+                offset += len(piece.texts)
+                job.pending -= 1
+                if job.pending == 0 and not job.future.done():
+                    job.future.set_result(np.concatenate([job.parts[start] for start in sorted(job.parts)]))
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    (length,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                    request = json.loads(await reader.readexactly(length))
+                except asyncio.IncompleteReadError:
+                    break
+                try:
+                    if request.get("model") and self.model_name and request["model"] != self.model_name:
+                        raise ValueError(f"Service embeds with '{self.model_name}', not '{request['model']}'")
+                    vectors = await self.submit(request["kind"], request["texts"], request.get("priority", INTERACTIVE))
+                    count, dim = vectors.shape if vectors.size else (0, 0)
+                    writer.write(_pack({"count": count, "dim": dim}, vectors.astype("<f4").tobytes()))
+                except Exception as e:
+                    writer.write(_pack({"error": repr(e)}))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """Serve until cancelled. A stale socket file from a previous run is replaced."""
+        self._wakeup = asyncio.Event()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        batcher = asyncio.create_task(self._batch_loop())
+        logger.info(f"Embedding service listening on {self.socket_path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
@@ -0,0 +1,264 @@
+"""
+Persisted, memory-mappable embedding store.
+
+Chunk embeddings are written here during ingestion, next to Qdrant, so a collection can be
+rebuilt (new name, distance, quantization or index profile) without running the model
+again. Each embedding model gets its own directory; data is appended in shards:
+
+    <root>/<model>/shard-00000/vectors.npy    float16 or float32 [n, dim]
+                               ids.npy        point IDs
+                               hashes.npy     blake2b-16 digest of the chunk text
+                               payloads.jsonl one Qdrant payload per row
+                               sources.json   the distinct payload sources in the shard
+
+On open only the hash and ID columns are read (memory-mapped) to build the indexes;
+vectors are memory-mapped and touched only for the rows that are looked up or re-indexed.
+Identical chunk text is embedded once (lookup by hash) but every point keeps its own row.
+
+Shards are append-only. When a source document that the store has rows for is re-ingested,
+`retire_source` records a tombstone so its older rows are left out of re-indexing. Rows of
+it that are still queued are dropped; tombstones are saved with the next shard.
+"""
+import hashlib
+import json
+import os
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from qdrant_client import models
+
+from rag_core.doc_store import DocStore
+from rag_core.profiles import CollectionProfile
+from rag_core.qdrant_store import QdrantStore
+
+SHARD_PREFIX = "shard-"
+TOMBSTONES = "tombstones.json"
+SHARD_SOURCES = "sources.json"
+
+
+def chunk_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _model_dir_name(model_name: str) -> str:
+    return model_name.replace("/", "__")
+
+
+class EmbeddingStore:
+    def __init__(self, root: str, model_name: str, dtype: str = "float16", shard_size: int = 50_000):
+        self.dir = os.path.join(root, _model_dir_name(model_name))
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.shard_size = shard_size
+        os.makedirs(self.dir, exist_ok=True)
+
+        # hash -> (shard name, row) of the first row with that text
+        self._index: Dict[bytes, Tuple[str, int]] = {}
+        self._ids = set()
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._pending: List[Tuple[str, bytes, np.ndarray, Dict]] = []
+        # Sources with rows in the written shards
+        self._sources = set()
+        for shard in self.shards():
+            hashes = np.load(os.path.join(self.dir, shard, "hashes.npy"), mmap_mode="r")
+            for row, digest in enumerate(hashes):
+                self._index.setdefault(bytes(digest), (shard, row))
+            self._ids.update(str(i) for i in np.load(os.path.join(self.dir, shard, "ids.npy"), mmap_mode="r"))
+            self._sources.update(self._shard_sources(shard))
+
+        # source -> number of shards that existed when it was retired
+        self._tombstones: Dict[str, int] = {}
+        if os.path.exists(os.path.join(self.dir, TOMBSTONES)):
+            with open(os.path.join(self.dir, TOMBSTONES), encoding="utf-8") as f:
+                self._tombstones = json.load(f)
+        self._tombstones_dirty = False
+
+    def _shard_sources(self, shard: str) -> List[str]:
+        path = os.path.join(self.dir, shard, SHARD_SOURCES)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        # Shards written before sources.json: read their payloads once
+        with open(os.path.join(self.dir, shard, "payloads.jsonl"), encoding="utf-8") as f:
+            return list({json.loads(line).get("source") for line in f} - {None})
+
+    def shards(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.dir) if name.startswith(SHARD_PREFIX))
+
+    def __len__(self) -> int:
+        return len(self._ids) + len(self._pending)
+
+    def __contains__(self, digest: bytes) -> bool:
+        return digest in self._index
+
+    def has_point(self, point_id) -> bool:
+        return str(point_id) in self._ids
+
+    def _shard_vectors(self, shard: str) -> np.ndarray:
+        if shard not in self._vectors:
+            self._vectors[shard] = np.load(os.path.join(self.dir, shard, "vectors.npy"), mmap_mode="r")
+        return self._vectors[shard]
+
+    def get(self, digests: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        """Stored vectors (as float32) for the digests that are present."""
+        found = {}
+        for digest in digests:
+            location = self._index.get(digest)
+            if location is not None:
+                shard, row = location
+                found[digest] = np.asarray(self._shard_vectors(shard)[row], dtype=np.float32)
+        return found
+
+    def add(self, point_ids: Sequence, digests: Sequence[bytes], vectors: Sequence, payloads: Sequence[Dict]):
+        """Queue new rows (already-stored point IDs are skipped); shards are written on `flush`."""
+        for point_id, digest, vector, payload in zip(point_ids, digests, vectors, payloads):
+            point_id = str(point_id)
+            if point_id in self._ids:
+                continue
+            self._ids.add(point_id)
+            self._pending.append((point_id, digest, np.asarray(vector, dtype=self.dtype), payload))
+        if len(self._pending) >= self.shard_size:
+            self.flush()
+
+    def retire_source(self, source: str):
+        """Leave rows already stored for `source` out of re-indexing (it is being re-ingested)."""
+        if any(payload.get("source") == source for _, _, _, payload in self._pending):
+            for point_id, _, _, payload in self._pending:
+                if payload.get("source") == source:
+                    self._ids.discard(point_id)
+            self._pending = [row for row in self._pending if row[3].get("source") != source]
+        # Only written shards need a tombstone; a source they don't have needs nothing
+        if source in self._sources:
+            self._sources.discard(source)
+            self._tombstones[source] = len(self.shards())
+            self._tombstones_dirty = True
+
+    def _save_tombstones(self):
+        if not self._tombstones_dirty:
+            return
+        with open(os.path.join(self.dir, TOMBSTONES), "w", encoding="utf-8") as f:
+            json.dump(self._tombstones, f)
+        self._tombstones_dirty = False
+
+    def flush(self):
+        if not self._pending:
+            self._save_tombstones()
+            return
+        shard = f"{SHARD_PREFIX}{len(self.shards()):05d}"
+        tmp_dir = os.path.join(self.dir, f".{shard}.tmp")
+        os.makedirs(tmp_dir)
+        ids, digests, vectors, payloads = zip(*self._pending)
+        np.save(os.path.join(tmp_dir, "vectors.npy"), np.stack(vectors))
+        np.save(os.path.join(tmp_dir, "ids.npy"), np.array(ids))
+        np.save(os.path.join(tmp_dir, "hashes.npy"), np.array(digests, dtype="S16"))
+        with open(os.path.join(tmp_dir, "payloads.jsonl"), "w", encoding="utf-8") as f:
+            for payload in payloads:
+                f.write(json.dumps(payload) + "\n")
+        sources = sorted({payload["source"] for payload in payloads if payload.get("source") is not None})
+        with open(os.path.join(tmp_dir, SHARD_SOURCES), "w", encoding="utf-8") as f:
+            json.dump(sources, f)
+        # Rename last so a crash never leaves a half-written shard behind
+        os.replace(tmp_dir, os.path.join(self.dir, shard))
+        for row, digest in enumerate(digests):
+            self._index.setdefault(digest, (shard, row))
+        self._sources.update(sources)
+        self._pending = []
+        # Only once the shard is in place, so a crash can't hide a source's old rows
+        # before its new ones are written
+        self._save_tombstones()
+
+    def iter_batches(self, batch_size: int = 1024) -> Iterator[Tuple[List[str], np.ndarray, List[Dict]]]:
+        """(ids, float32 vectors, payloads) for every live (not retired) row, shard by shard."""
+        self.flush()
+        for shard_number, shard in enumerate(self.shards()):
+            path = os.path.join(self.dir, shard)
+            ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+            vectors = self._shard_vectors(shard)
+            with open(os.path.join(path, "payloads.jsonl"), encoding="utf-8") as f:
+                for start in range(0, len(ids), batch_size):
+                    end = min(start + batch_size, len(ids))
+                    payloads = [json.loads(next(f)) for _ in range(start, end)]
+                    live = [
+                        i for i, payload in enumerate(payloads)
+                        if shard_number >= self._tombstones.get(payload.get("source"), 0)
+                    ]
+                    if live:
+                        yield ([str(ids[start + i]) for i in live],
+                               np.asarray(vectors[start:end], dtype=np.float32)[live],
+                               [payloads[i] for i in live])
+
+    def vector_dim(self) -> Optional[int]:
+        shards = self.shards()
+        return int(self._shard_vectors(shards[0]).shape[1]) if shards else None
+
+
+def open_embedding_store(root: Optional[str], model_name: str) -> Optional[EmbeddingStore]:
+    """EmbeddingStore under `root`, or None when the store is not configured."""
+    return EmbeddingStore(root, model_name) if root else None
+
+
+async def backfill_from_collection(store: QdrantStore,
+                                   embedding_store: EmbeddingStore,
+                                   collection_name: str,
+                                   embed_batch: Callable[[List[str]], List[List[float]]],
+                                   doc_store: Optional[DocStore] = None,
+                                   page_size: int = 256) -> Dict[str, int]:
+    """
+    Add the points of an existing collection that the store doesn't have yet. Their text comes
+    from the payload `context` or the doc store; only text that was never embedded is embedded.
+    """
+    counts = {"reused": 0, "embedded": 0, "skipped": 0}
+    offset = None
+    while True:
+        records, offset = await store.scroll(collection_name, limit=page_size, offset=offset, with_payload=True)
+        records = [r for r in records if not embedding_store.has_point(r.id)]
+        texts = doc_store.get_many([r.id for r in records]) if doc_store is not None else {}
+        rows = []
+        for record in records:
+            payload = record.payload or {}
+            text = payload.get("context") or texts.get(str(record.id), {}).get("context")
+            if text is None:
+                counts["skipped"] += 1
+                continue
+            rows.append((record.id, chunk_hash(text), text, payload))
+
+        stored = embedding_store.get([digest for _, digest, _, _ in rows])
+        missing = {digest: text for _, digest, text, _ in rows if digest not in stored}
+        if missing:
+            stored.update(zip(missing, embed_batch(list(missing.values()))))
+        counts["embedded"] += len(missing)
+        counts["reused"] += len(rows) - len(missing)
+        embedding_store.add(
+            [row[0] for row in rows], [row[1] for row in rows], [stored[row[1]] for row in rows], [row[3] for row in rows]
+        )
+        if offset is None:
+            break
+    embedding_store.flush()
+    return counts
+
+
+async def rebuild_collection(store: QdrantStore,
+                             embedding_store: EmbeddingStore,
+                             collection_name: str,
+                             profile: CollectionProfile,
+                             distance: models.Distance = models.Distance.DOT,
+                             batch_size: int = 1024) -> int:
+    """Create `collection_name` from the stored vectors (bulk upload, index built once) and return its size."""
+    vector_dim = embedding_store.vector_dim()
+    if vector_dim is None:
+        raise ValueError(f"Embedding store {embedding_store.dir} is empty.")
+    if await store.collection_exists(collection_name):
+        raise FileExistsError(f"Collection '{collection_name}' already exists; re-index into a fresh one.")
+
+    await store.ensure_collection(collection_name, vector_dim, distance=distance, profile=profile.bulk())
+    await store.ensure_payload_indexes(collection_name)
+    total = 0
+    for ids, vectors, payloads in embedding_store.iter_batches(batch_size):
+        points = [
+            models.PointStruct(id=point_id, vector=vector.tolist(), payload=payload)
+            for point_id, vector, payload in zip(ids, vectors, payloads)
+        ]
+        await store.upsert(collection_name, points, wait=True)
+        total += len(points)
+    await store.finalize_collection(collection_name, profile)
+    return total
@@ -0,0 +1,161 @@
+"""
+Parallel search over several collections with one merged ranking.
+
+The query is embedded once by the caller; every collection is then searched at the same
+time, each under its own timeout, so a slow or missing collection only drops out of the
+result instead of holding up the others. Raw scores aren't comparable across collections
+(different corpora, possibly different distances), so each collection's scores are
+min-max normalized before the top-k is taken from the union. Every hit keeps its
+provenance: collection, point ID, raw and normalized score.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from qdrant_client import models
+
+from rag_core.compression import CompressionReport, Passage, compress
+from rag_core.doc_store import DocStore
+from rag_core.profiles import CollectionProfile
+from rag_core.qdrant_store import QdrantStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COLLECTION_TIMEOUT = 2.0
+
+
+@dataclass(frozen=True)
+class CollectionTarget:
+    name: str
+    # Seconds this collection may take; None uses the fan-out default
+    timeout: Optional[float] = None
+
+
+@dataclass
+class FanOutHit:
+    collection: str
+    id: Any
+    score: float  # normalized to [0, 1] within its collection
+    raw_score: float
+    payload: Dict
+
+
+@dataclass
+class FanOutResult:
+    hits: List[FanOutHit] = field(default_factory=list)
+    timed_out: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+
+    def __str__(self) -> str:
+        collections = sorted({hit.collection for hit in self.hits})
+        return (f"{len(self.hits)} hits from {collections}, timed out {self.timed_out}, "
+                f"failed {sorted(self.failed)}")
+
+
+def parse_collections(spec: str, default_timeout: float = DEFAULT_COLLECTION_TIMEOUT) -> List[CollectionTarget]:
+    """'covid-faq,python-faq:0.5' -> targets; ':<seconds>' overrides the timeout per collection."""
+    targets = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, timeout = item.partition(":")
+        targets.append(CollectionTarget(name.strip(), float(timeout) if timeout else default_timeout))
+    return targets
+
+
+def normalize_scores(hits: Sequence[models.ScoredPoint]) -> List[float]:
+    """Min-max scale one collection's scores; a single hit (or all equal) maps to 1.0."""
+    if not hits:
+        return []
+    scores = [hit.score for hit in hits]
+    low, high = min(scores), max(scores)
+    if high == low:
+        return [1.0] * len(scores)
+    return [(s - low) / (high - low) for s in scores]
+
+
+async def fan_out_search(store: QdrantStore,
+                         targets: Sequence[CollectionTarget],
+                         vector: Sequence[float],
+                         limit: int = 3,
+                         query_filter: Optional[models.Filter] = None,
+                         profile: Optional[CollectionProfile] = None,
+                         default_timeout: float = DEFAULT_COLLECTION_TIMEOUT,
+                         doc_store: Optional[DocStore] = None,
+                         candidates: Optional[int] = None) -> FanOutResult:
+    """
+    Search all `targets` concurrently and merge their hits into one top-`limit` list. Each
+    collection returns `candidates` hits (default 2 * limit) so its score range, and with it
+    the normalization, isn't decided by just a handful of points.
+    """
+    candidates = candidates or 2 * limit
+    search_params = profile.search_params() if profile is not None else None
+
+    async def search(target: CollectionTarget):
+        return await asyncio.wait_for(
+            store.query(
+                target.name,
+                vector,
+                limit=candidates,
+                with_payload=True,
+                query_filter=query_filter,
+                search_params=search_params,
+            ),
+            timeout=target.timeout if target.timeout is not None else default_timeout,
+        )
+
+    responses = await asyncio.gather(*(search(t) for t in targets), return_exceptions=True)
+
+    result = FanOutResult()
+    for target, response in zip(targets, responses):
+        if isinstance(response, asyncio.TimeoutError):
+            result.timed_out.append(target.name)
+            logger.warning(f"Collection '{target.name}' timed out, merging the others")
+            continue
+        if isinstance(response, BaseException):
+            result.failed[target.name] = repr(response)
+            logger.warning(f"Collection '{target.name}' failed ({response!r}), merging the others")
+            continue
+        for hit, score in zip(response, normalize_scores(response)):
+            result.hits.append(FanOutHit(target.name, hit.id, score, hit.score, hit.payload or {}))
+
+    # Ties (e.g. each collection's best hit is 1.0) fall back to the raw score
+    result.hits.sort(key=lambda h: (h.score, h.raw_score), reverse=True)
+    result.hits = result.hits[:limit]
+
+    if doc_store is not None:
+        # Points ingested with a doc store keep their text there; others still carry `context`
+        docs = doc_store.get_many([hit.id for hit in result.hits])
+        for hit in result.hits:
+            doc = docs.get(str(hit.id), {})
+            hit.payload = {**hit.payload, **{k: v for k, v in doc.items() if v is not None}}
+    return result
+
+
+def compress_fan_out(result: FanOutResult, token_budget: int) -> Tuple[List[str], CompressionReport]:
+    """
+    `compress` the merged hits (chunks only merge within the same collection and source) and
+    prefix each kept passage with its provenance.
+    """
+    passages = []
+    for index, hit in enumerate(result.hits):
+        if "context" not in hit.payload:
+            continue
+        passages.append(Passage(
+            text=hit.payload["context"],
+            source=f"{hit.collection}/{hit.payload.get('source')}",
+            char_start=hit.payload.get("char_start"),
+            char_end=hit.payload.get("char_end"),
+            ref=index,
+        ))
+    kept, report = compress(passages, token_budget)
+
+    contexts = []
+    for passage in kept:
+        # Merged passages are labelled with their best-ranked chunk
+        hit = result.hits[passage.ref]
+        label = hit.collection if hit.payload.get("source") is None else f"{hit.collection}: {hit.payload['source']}"
+        contexts.append(f"[{label} | score {hit.score:.2f} (raw {hit.raw_score:.3f})] {passage.text}")
+    return contexts, report
@@ -0,0 +1,70 @@
+"""
+Firecrawl search client shared by the MCP servers.
+
+Searches go through a `SingleFlightCache` keyed by the normalized query: concurrent
+identical searches share one POST, results are cached for a short TTL and errors (other
+than timeouts) for an even shorter one. The POST has a client-side timeout and tells
+Firecrawl to give up a bit earlier than that; a caller's time budget only bounds its own
+wait. Upstream calls go through a `RateController` under the "firecrawl" key (rate,
+adaptive concurrency, Retry-After).
+"""
+import asyncio
+from typing import Dict, List, Optional
+
+import requests
+
+from rag_core.rate_limit import RateController
+from rag_core.single_flight import SingleFlightCache, normalize_query
+
+RATE_KEY = "firecrawl"
+
+
+class FirecrawlClient:
+    def __init__(self,
+                 url: str,
+                 api_key: Optional[str],
+                 timeout: float = 30.0,
+                 cache_ttl: float = 300.0,
+                 negative_ttl: float = 10.0,
+                 rate: Optional[RateController] = None):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+        # Timeouts aren't cached: a search that was slow once may well be fast the next time
+        self.cache = SingleFlightCache(
+            ttl=cache_ttl, negative_ttl=negative_ttl, uncached_errors=(requests.exceptions.Timeout,)
+        )
+        self.session = requests.Session()
+        self.rate = rate or RateController()
+
+    def _post_search(self, query: str) -> List[Dict]:
+        payload = {"query": query, "timeout": int(self.timeout * 1000)}
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        # Client timeout is a little longer than the server-side one so Firecrawl can answer first
+        response = self.rate.request(
+            self.session, "POST", self.url, key=RATE_KEY, json=payload, headers=headers, timeout=self.timeout + 5
+        )
+        response.raise_for_status()
+        return response.json().get("data", [])
+
+    async def search(self, query: str, budget: Optional[float] = None) -> List[Dict]:
+        """
+        Search results (`{"url", "title", ...}` dicts). Raises `requests` exceptions on failure,
+        `requests.exceptions.Timeout` included when the search doesn't finish within `budget`
+        seconds. The search itself runs under the client's own timeout, shared with any
+        concurrent identical searches, and its result is still cached.
+        """
+        try:
+            return await self.cache.get(
+                normalize_query(query),
+                lambda: asyncio.to_thread(self._post_search, query),
+                timeout=budget,
+            )
+        except asyncio.TimeoutError:
+            raise requests.exceptions.Timeout(f"Firecrawl search did not finish within {budget:.1f}s") from None
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.cache.stats)
@@ -0,0 +1,161 @@
+"""
+Parallel, streaming document loader for large corpora.
+
+`iter_documents` walks the whole corpus directory, parses files in a process pool and
+yields `{"document", "source"}` dicts in completion order, so embedding can start as soon
+as the first file is parsed instead of after the whole corpus is in memory.
+
+- Only a bounded amount of work is in flight: new files are submitted while the total size
+  of pending files stays under `max_inflight_bytes` (at least one file is always in flight).
+- A manifest of (size, mtime) per file lets re-runs skip files that haven't changed. A file
+  is only recorded once the caller has consumed its document. Entries are kept per
+  `target` (e.g. a Qdrant URL and collection), so ingesting the same corpus somewhere else
+  doesn't skip files that only went to the first place; `reset_manifest` forgets a
+  target's entries, for when its collection was just (re)created.
+- Optionally the workers also clean (`preprocess`) and chunk (`chunker`) each document, so
+  that CPU work runs in parallel across documents too.
+"""
+import json
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from rag_core.chunker import Chunker
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".md")
+MANIFEST_NAME = ".ingest_manifest.json"
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_file(path: str,
+                preprocess: Optional[Callable[[str], str]] = None,
+                chunker: Optional[Chunker] = None) -> Tuple[str, str, Optional[list]]:
+    """Worker: extract (and optionally clean and chunk) the text of a single file. Runs in a child process."""
+    if path.lower().endswith(".pdf"):
+        from pypdf import PdfReader
+
+        reader = PdfReader(path)
+        text = "\n".join(page.extract_text() or "" for page in reader.pages)
+    else:
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+    if preprocess is not None:
+        text = preprocess(text)
+    chunks = chunker.chunk(text) if chunker is not None else None
+    return path, text, chunks
+
+
+def _fingerprint(path: str) -> List[int]:
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def walk_corpus(corpus_dir: str, extensions: Tuple[str, ...] = SUPPORTED_EXTENSIONS) -> Iterator[str]:
+    """All supported files under `corpus_dir`, in a stable order."""
+    for root, dirs, files in os.walk(corpus_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(extensions):
+                yield os.path.join(root, name)
+
+
+class Manifest:
+    """
+    (size, mtime) per file ingested into `target`, persisted as JSON next to the corpus by
+    default. The file holds `{target: {path: [size, mtime_ns]}}`.
+    """
+    def __init__(self, path: str, target: str = ""):
+        self.path = path
+        self.targets: Dict[str, Dict[str, List[int]]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            # A manifest from before targets (flat {path: fingerprint}) can't tell where
+            # its files went, so it is dropped and everything is ingested again
+            if all(isinstance(entries, dict) for entries in data.values()):
+                self.targets = data
+        self.entries = self.targets.setdefault(target, {})
+
+    def reset(self):
+        """Forget every file recorded for this target."""
+        self.entries.clear()
+
+    def is_unchanged(self, file_path: str) -> bool:
+        return self.entries.get(file_path) == _fingerprint(file_path)
+
+    def record(self, file_path: str):
+        self.entries[file_path] = _fingerprint(file_path)
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.targets, f)
+        os.replace(tmp, self.path)
+
+
+def iter_documents(corpus_dir: str,
+                   workers: Optional[int] = None,
+                   max_inflight_bytes: int = 256 * 1024 * 1024,
+                   manifest_path: Optional[str] = None,
+                   target: str = "",
+                   reset_manifest: bool = False,
+                   skip_unchanged: bool = True,
+                   save_every: int = 50,
+                   preprocess: Optional[Callable[[str], str]] = None,
+                   chunker: Optional[Chunker] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield `{"document": text, "source": path}` for every changed file under `corpus_dir`,
+    in the order parsing completes. With a `chunker`, each dict also carries `"chunks"`.
+    "Changed" is relative to what was last ingested into `target`.
+    """
+    manifest = Manifest(manifest_path or os.path.join(corpus_dir, MANIFEST_NAME), target)
+    if reset_manifest:
+        manifest.reset()
+    paths = (
+        p for p in walk_corpus(corpus_dir)
+        if not (skip_unchanged and manifest.is_unchanged(p))
+    )
+
+    pending: Dict[Future, Tuple[str, int]] = {}
+    inflight_bytes = 0
+    consumed = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        def fill():
+            nonlocal inflight_bytes
+            for path in paths:
+                size = os.path.getsize(path)
+                pending[pool.submit(_parse_file, path, preprocess, chunker)] = (path, size)
+                inflight_bytes += size
+                if inflight_bytes >= max_inflight_bytes:
+                    return
+
+        try:
+            fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, size = pending.pop(future)
+                    inflight_bytes -= size
+                    try:
+                        _, text, chunks = future.result()
+                    except Exception as e:
+                        # Not recorded in the manifest, so it is retried on the next run
+                        logger.warning(f"Skipping unparseable file {path}: {e!r}")
+                        continue
+                    document = {"document": text, "source": path}
+                    if chunker is not None:
+                        document["chunks"] = chunks
+                    yield document
+                    manifest.record(path)
+                    consumed += 1
+                    if consumed % save_every == 0:
+                        manifest.save()
+                if inflight_bytes < max_inflight_bytes:
+                    fill()
+        finally:
+            for future in pending:
+                future.cancel()
+            manifest.save()
@@ -0,0 +1,175 @@
+"""
+Query-aware passage selection for crawled web pages.
+
+Instead of the first few hundred characters of a page (usually navigation or a cookie
+banner), each page is split into passages along its block elements, with page chrome
+(nav, header, footer, forms, cookie/consent banners) removed. Passages from all pages are
+then ranked against the query in two stages:
+
+1. BM25 over the pooled passages, which is cheap and keeps the top `candidates`,
+2. one batched embedding call for those candidates, ranked by cosine similarity to the
+   query embedding (skipped when no embedding model is given).
+
+The best passages are returned until the character budget is spent.
+"""
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from bs4 import BeautifulSoup
+
+BLOCK_TAGS = ["p", "li", "h1", "h2", "h3", "h4", "h5", "h6", "td", "blockquote", "pre", "dd"]
+CHROME_TAGS = ["script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "iframe"]
+# Whole id/class names of banners, menus and other boilerplate containers ("has-sidebar" or
+# "shareable-content" are not one of them)
+CHROME_NAMES = frozenset({
+    "cookie", "cookies", "cookie-banner", "cookie-notice", "cookie-consent", "consent", "consent-banner", "gdpr",
+    "banner", "site-banner", "navbar", "nav-menu", "main-menu", "menu-bar", "breadcrumb", "breadcrumbs",
+    "sidebar", "footer", "site-footer", "social-share", "share-buttons", "sharing", "subscribe", "newsletter",
+})
+# A hinted container holding more than this share of the page's text is the content itself
+MAX_CHROME_SHARE = 0.5
+MIN_PASSAGE_CHARS = 40
+MAX_PASSAGE_CHARS = 600
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the this to was "
+    "were what when where which who why will with do does did can i you me my your".split()
+)
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+@dataclass
+class ScoredPassage:
+    url: str
+    text: str
+    score: float
+
+
+def _tokens(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def _text_length(tag) -> int:
+    return sum(len(s.strip()) for s in tag.find_all(string=True))
+
+
+def _is_chrome(tag) -> bool:
+    names = (tag.get("id") or "").split() + (tag.get("class") or [])
+    return any(name.lower().replace("_", "-") in CHROME_NAMES for name in names)
+
+
+def extract_passages(html: str, max_chars: int = MAX_PASSAGE_CHARS) -> List[str]:
+    """Visible text of `html` as passages of up to `max_chars`, page chrome removed."""
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(CHROME_TAGS):
+        tag.decompose()
+    page_chars = _text_length(soup)
+    for tag in soup.find_all(True):
+        if tag.decomposed or tag.name in ("html", "body", "main", "article") or not _is_chrome(tag):
+            continue
+        if _text_length(tag) <= MAX_CHROME_SHARE * page_chars:
+            tag.decompose()
+
+    blocks = []
+    for tag in soup.find_all(BLOCK_TAGS):
+        # Nested blocks (li inside td, ...) are picked up on their own
+        if tag.find(BLOCK_TAGS):
+            continue
+        text = " ".join(tag.get_text(separator=" ", strip=True).split())
+        if text:
+            blocks.append(text)
+    if not blocks:
+        text = " ".join(soup.get_text(separator=" ", strip=True).split())
+        blocks = re.split(r"(?<=[.!?])\s+", text) if text else []
+
+    # Pack consecutive blocks (headings with their paragraphs, short list items) into passages
+    passages: List[str] = []
+    current = ""
+    for block in blocks:
+        while len(block) > max_chars:
+            cut = block.rfind(" ", 0, max_chars)
+            cut = cut if cut > max_chars // 2 else max_chars
+            if current:
+                passages.append(current)
+                current = ""
+            passages.append(block[:cut])
+            block = block[cut:].strip()
+        if current and len(current) + 1 + len(block) > max_chars:
+            passages.append(current)
+            current = block
+        else:
+            current = f"{current} {block}".strip()
+    if current:
+        passages.append(current)
+    return [p for p in passages if len(p) >= MIN_PASSAGE_CHARS]
+
+
+def bm25_scores(query: str, passages: Sequence[str], k1: float = 1.2, b: float = 0.75) -> List[float]:
+    """BM25 score of every passage for `query`, with IDF taken over `passages` themselves."""
+    docs = [Counter(_tokens(p)) for p in passages]
+    if not docs:
+        return []
+    avg_len = sum(sum(d.values()) for d in docs) / len(docs) or 1.0
+    terms = set(_tokens(query))
+    idf = {}
+    for term in terms:
+        n = sum(1 for d in docs if term in d)
+        idf[term] = math.log(1 + (len(docs) - n + 0.5) / (n + 0.5))
+    scores = []
+    for d in docs:
+        length = sum(d.values())
+        score = 0.0
+        for term in terms:
+            tf = d.get(term, 0)
+            if tf:
+                score += idf[term] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_len))
+        scores.append(score)
+    return scores
+
+
+def select_passages(query: str,
+                    pages: Dict[str, List[str]],
+                    embed_model=None,
+                    char_budget: int = 3000,
+                    candidates: int = 24,
+                    query_vector: Optional[Sequence[float]] = None) -> List[ScoredPassage]:
+    """
+    Best passages across `pages` ({url: passages}) for `query`, best first, within
+    `char_budget` characters. `embed_model` needs `get_query_embedding` and
+    `get_text_embedding_batch`; without one the BM25 ranking is final. Pass
+    `query_vector` if the query is already embedded.
+    """
+    pool = [(url, text) for url, passages in pages.items() for text in passages]
+    if not pool:
+        return []
+    lexical = bm25_scores(query, [text for _, text in pool])
+    # Ties (e.g. no query term on any page) keep page order, which is the search ranking
+    ranked = sorted(range(len(pool)), key=lambda i: -lexical[i])[:candidates]
+    scores = {i: lexical[i] for i in ranked}
+
+    if embed_model is not None and len(ranked) > 1:
+        if query_vector is None:
+            query_vector = embed_model.get_query_embedding(query)
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        vectors = np.asarray(
+            embed_model.get_text_embedding_batch([pool[i][1] for i in ranked], show_progress_bar=False),
+            dtype=np.float32,
+        )
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query_vector)
+        similarity = vectors @ query_vector / np.where(norms == 0, 1, norms)
+        scores = {i: float(s) for i, s in zip(ranked, similarity)}
+        ranked = sorted(ranked, key=lambda i: -scores[i])
+
+    selected: List[ScoredPassage] = []
+    remaining = char_budget
+    for i in ranked:
+        url, text = pool[i]
+        if len(text) > remaining:
+            continue
+        selected.append(ScoredPassage(url, text, scores[i]))
+        remaining -= len(text)
+    return selected
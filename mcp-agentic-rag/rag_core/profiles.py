@@ -0,0 +1,71 @@
+"""
+Collection profiles: how a collection is indexed and stored, and how it is searched.
+
+- `ram`:  vectors and HNSW graph in RAM, for low-latency serving.
+- `disk`: vectors, HNSW graph and payload memory-mapped from disk, for corpora that don't fit in RAM.
+- `bulk`: `ram`, but loaded with HNSW disabled (m=0) and the graph built once at the end.
+
+Any profile can be loaded in bulk mode with `profile.bulk()`. HNSW `m` / `ef_construct` and
+the query-time `ef` can be overridden per profile with `dataclasses.replace`.
+"""
+from dataclasses import dataclass, replace
+from typing import Dict, Optional
+
+from qdrant_client import models
+
+
+@dataclass(frozen=True)
+class CollectionProfile:
+    name: str
+    m: int = 16
+    ef_construct: int = 100
+    # Query-time HNSW ef; None keeps Qdrant's default
+    ef: Optional[int] = None
+    on_disk: bool = False
+    # Build the HNSW graph once after ingestion instead of while uploading
+    defer_index: bool = False
+    indexing_threshold: int = 20000
+
+    def bulk(self) -> "CollectionProfile":
+        return replace(self, defer_index=True)
+
+    def vector_params(self, size: int, distance: models.Distance) -> models.VectorParams:
+        return models.VectorParams(size=size, distance=distance, on_disk=self.on_disk)
+
+    def create_kwargs(self) -> Dict:
+        """Extra `create_collection` arguments for ingestion."""
+        return {
+            "hnsw_config": models.HnswConfigDiff(
+                m=0 if self.defer_index else self.m,
+                ef_construct=self.ef_construct,
+                on_disk=self.on_disk,
+            ),
+            "optimizers_config": models.OptimizersConfigDiff(indexing_threshold=self.indexing_threshold),
+            "on_disk_payload": self.on_disk,
+        }
+
+    def finalize_kwargs(self) -> Dict:
+        """`update_collection` arguments once ingestion is done (builds the deferred index)."""
+        return {
+            "hnsw_config": models.HnswConfigDiff(m=self.m, ef_construct=self.ef_construct, on_disk=self.on_disk),
+            "optimizers_config": models.OptimizersConfigDiff(indexing_threshold=self.indexing_threshold),
+        }
+
+    def search_params(self) -> Optional[models.SearchParams]:
+        return models.SearchParams(hnsw_ef=self.ef) if self.ef is not None else None
+
+
+PROFILES: Dict[str, CollectionProfile] = {
+    "ram": CollectionProfile("ram", m=16, ef_construct=128, ef=64),
+    "disk": CollectionProfile("disk", m=16, ef_construct=100, ef=64, on_disk=True),
+}
+PROFILES["bulk"] = replace(PROFILES["ram"], name="bulk").bulk()
+
+DEFAULT_PROFILE = "ram"
+
+
+def get_profile(name: Optional[str] = None) -> CollectionProfile:
+    name = name or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown collection profile '{name}', expected one of {sorted(PROFILES)}.")
+    return PROFILES[name]
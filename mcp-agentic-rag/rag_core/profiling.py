@@ -0,0 +1,192 @@
+"""
+On-demand profiling for tool calls and ingestion runs.
+
+Off unless `PROFILE_DIR` is set. When it is off, `profiled` returns the tool function
+unchanged, so there is no per-call cost at all. When it is on:
+
+- `PROFILE_SAMPLE_RATE` (default 0.05) is the fraction of tool calls that are profiled,
+- `PROFILE_MODE` picks the profiler: `sample` (the default; a background thread samples the
+  stacks of every thread every `PROFILE_INTERVAL_MS`, so the work the tools hand to
+  `asyncio.to_thread` (embedding, page fetches, passage selection) shows up) or `cprofile`
+  (deterministic, but it only sees the event-loop thread and leaves that work out),
+- `PROFILE_MEMORY` (default on) also records tracemalloc snapshots.
+
+Each profiled call writes `<name>-<UTC time>-<request id>.*` files to `PROFILE_DIR`:
+`.prof` (pstats, open with snakeviz or `python -m pstats`) or `.folded` (collapsed stacks
+for flamegraph.pl / speedscope), plus `.tracemalloc` (a snapshot for
+`tracemalloc.Snapshot.load`) and `.memory.txt` (top allocations). A profile covers
+everything that ran in the process meanwhile, including interleaved requests; only one
+call is profiled at a time.
+"""
+import cProfile
+import functools
+import logging
+import os
+import random
+import sys
+import threading
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+MODES = ("cprofile", "sample")
+TOP_ALLOCATIONS = 30
+
+
+@dataclass(frozen=True)
+class ProfileConfig:
+    directory: str
+    sample_rate: float = 0.05
+    mode: str = "sample"
+    memory: bool = True
+    interval_ms: float = 5.0
+
+
+def config_from_env() -> Optional[ProfileConfig]:
+    """ProfileConfig from the PROFILE_* variables, or None when profiling is off."""
+    directory = os.getenv("PROFILE_DIR")
+    if not directory:
+        return None
+    mode = os.getenv("PROFILE_MODE", "sample")
+    if mode not in MODES:
+        raise ValueError(f"Unknown PROFILE_MODE '{mode}', expected one of {MODES}.")
+    return ProfileConfig(
+        directory=directory,
+        sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0.05")),
+        mode=mode,
+        memory=os.getenv("PROFILE_MEMORY", "1").lower() in ("1", "true", "yes"),
+        interval_ms=float(os.getenv("PROFILE_INTERVAL_MS", "5")),
+    )
+
+
+class StackSampler:
+    """Samples every thread's Python stack on a timer and counts collapsed stacks."""
+    def __init__(self, interval_ms: float):
+        self.interval = interval_ms / 1000
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                self.stacks[";".join([names.get(thread_id, str(thread_id))] + frames[::-1])] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+_active = threading.Lock()
+
+
+@contextmanager
+def profile_block(config: ProfileConfig, name: str, request_id: Optional[str] = None) -> Iterator[Optional[str]]:
+    """
+    Profile the enclosed block and write the results; yields the file prefix, or None (and
+    runs the block unprofiled) when another profile is already running.
+    """
+    if not _active.acquire(blocking=False):
+        yield None
+        return
+    try:
+        os.makedirs(config.directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        prefix = os.path.join(config.directory, f"{name}-{stamp}-{request_id or uuid.uuid4().hex[:8]}")
+
+        # Only start tracemalloc if nobody else (e.g. -X tracemalloc) did
+        own_tracemalloc = config.memory and not tracemalloc.is_tracing()
+        if own_tracemalloc:
+            tracemalloc.start(10)
+        profiler = cProfile.Profile() if config.mode == "cprofile" else StackSampler(config.interval_ms)
+        if config.mode == "cprofile":
+            profiler.enable()
+        else:
+            profiler.start()
+        try:
+            yield prefix
+        finally:
+            if config.mode == "cprofile":
+                profiler.disable()
+                profiler.dump_stats(f"{prefix}.prof")
+            else:
+                profiler.stop()
+                profiler.write(f"{prefix}.folded")
+            if config.memory:
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                if own_tracemalloc:
+                    tracemalloc.stop()
+                snapshot.dump(f"{prefix}.tracemalloc")
+                with open(f"{prefix}.memory.txt", "w", encoding="utf-8") as f:
+                    f.write(f"peak traced memory: {peak / 1e6:.1f} MB\n\n")
+                    for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                        f.write(f"{stat}\n")
+            logger.info(f"Profile of {name} written to {prefix}.*")
+    finally:
+        _active.release()
+
+
+def profiled(name: str,
+             config: Optional[ProfileConfig] = None,
+             request_id: Optional[Callable[[], Optional[str]]] = None):
+    """
+    Decorator for async tool functions: profile a sampled fraction of calls. With profiling
+    off the function is returned as is. `request_id` supplies the ID for the file names.
+    """
+    config = config if config is not None else config_from_env()
+
+    def decorate(fn):
+        if config is None or config.sample_rate <= 0:
+            return fn
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if random.random() >= config.sample_rate:
+                return await fn(*args, **kwargs)
+            try:
+                rid = request_id() if request_id is not None else None
+            except Exception:
+                rid = None
+            with profile_block(config, name, rid):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+@contextmanager
+def profile_run(name: str, config: Optional[ProfileConfig] = None) -> Iterator[Optional[str]]:
+    """Profile a whole run (e.g. an ingestion script) when profiling is on; no sampling."""
+    config = config if config is not None else config_from_env()
+    if config is None:
+        yield None
+        return
+    with profile_block(config, name) as prefix:
+        yield prefix
@@ -0,0 +1,322 @@
+"""
+Async, pooled access to Qdrant.
+
+Every piece of the app (both MCP servers, FAQEngine, create_vectors.py and get_vectors.py)
+goes through `QdrantStore` instead of building its own `QdrantClient`. The store:
+
+- keeps one `AsyncQdrantClient` (and so one gRPC channel) per event loop and URL,
+- applies a per-operation timeout (query / upsert / admin calls),
+- retries transient errors with jittered exponential backoff,
+- only uses `query_points` for searching.
+
+Sync code (scripts, FAQEngine) uses `run_sync`, which drives the store on a single
+background event loop so that the pooled client is reused across calls.
+"""
+import asyncio
+import logging
+import random
+import threading
+from dataclasses import dataclass
+from typing import Any, Coroutine, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from qdrant_client import AsyncQdrantClient, models
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+
+from rag_core.profiles import CollectionProfile
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# ":memory:" gives an in-process Qdrant stand-in (handy for local checks), and anything
+# that isn't an http(s) URL is treated as the path of a local (embedded) Qdrant.
+DEFAULT_QDRANT_URL = "http://localhost:6333"
+IN_MEMORY = ":memory:"
+
+# Payload fields written at ingestion time and indexed as keywords for filtered search.
+PAYLOAD_INDEX_FIELDS = ("source", "doc_type", "ingest_date")
+
+# gRPC status codes worth retrying, by name so we don't need grpc imported here.
+_RETRYABLE_GRPC_CODES = {"UNAVAILABLE", "DEADLINE_EXCEEDED", "RESOURCE_EXHAUSTED", "ABORTED"}
+
+
+@dataclass(frozen=True)
+class Timeouts:
+    """Per-operation timeouts in seconds."""
+    query: float = 5.0
+    upsert: float = 60.0
+    admin: float = 30.0
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Exponential backoff with full jitter: sleep ~ U(0, min(max_delay, base_delay * 2**attempt))."""
+    attempts: int = 4
+    base_delay: float = 0.1
+    max_delay: float = 2.0
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+def build_filter(sources: Optional[Sequence[str]] = None,
+                 doc_types: Optional[Sequence[str]] = None,
+                 ingest_dates: Optional[Sequence[str]] = None) -> Optional[models.Filter]:
+    """
+    Qdrant filter matching any of the given values per field (fields are ANDed).
+    Returns None when no filter is requested.
+    """
+    conditions = [
+        models.FieldCondition(key=key, match=models.MatchAny(any=list(values)))
+        for key, values in (("source", sources), ("doc_type", doc_types), ("ingest_date", ingest_dates))
+        if values
+    ]
+    return models.Filter(must=conditions) if conditions else None
+
+
+def is_transient(exc: BaseException) -> bool:
+    """True for errors that are likely to go away on retry (timeouts, 5xx/429, unavailable channel)."""
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError, ResponseHandlingException)):
+        return True
+    if isinstance(exc, UnexpectedResponse):
+        return exc.status_code == 429 or exc.status_code >= 500
+    code = getattr(exc, "code", None)
+    if callable(code):  # grpc.aio.AioRpcError
+        try:
+            return getattr(code(), "name", "") in _RETRYABLE_GRPC_CODES
+        except Exception:
+            return False
+    return False
+
+
+# One client per (event loop, url, transport). gRPC aio channels are bound to the loop
+# they were created on, so a client can only be shared within that loop.
+_clients: Dict[Tuple[int, str, bool], AsyncQdrantClient] = {}
+_clients_lock = threading.Lock()
+_stats = {"clients_created": 0, "retries": 0, "calls": 0}
+
+
+def stats() -> Dict[str, int]:
+    """Counters for the pooled clients (used to verify connection reuse)."""
+    return dict(_stats)
+
+
+def _new_client(url: str, prefer_grpc: bool, timeout: float) -> AsyncQdrantClient:
+    _stats["clients_created"] += 1
+    if url == IN_MEMORY:
+        return AsyncQdrantClient(location=IN_MEMORY)
+    if not url.startswith(("http://", "https://")):
+        return AsyncQdrantClient(path=url)
+    return AsyncQdrantClient(url=url, prefer_grpc=prefer_grpc, timeout=int(timeout))
+
+
+class QdrantStore:
+    """
+    Thin data-access layer over `AsyncQdrantClient` with pooling, timeouts and retries.
+    """
+    def __init__(self,
+                 url: Optional[str] = None,
+                 prefer_grpc: bool = True,
+                 timeouts: Timeouts = Timeouts(),
+                 retry: RetryPolicy = RetryPolicy()):
+        self.url = url or DEFAULT_QDRANT_URL
+        self.prefer_grpc = prefer_grpc
+        self.timeouts = timeouts
+        self.retry = retry
+
+    @property
+    def client(self) -> AsyncQdrantClient:
+        """The pooled client for the running event loop."""
+        key = (id(asyncio.get_running_loop()), self.url, self.prefer_grpc)
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _new_client(self.url, self.prefer_grpc, self.timeouts.admin)
+                _clients[key] = client
+        return client
+
+    async def _call(self, op: str, timeout: float, fn, *args, budget: Optional[float] = None, **kwargs):
+        """
+        Run `fn` with a timeout, retrying transient failures. `budget` bounds all attempts
+        together (raising `asyncio.TimeoutError` when it runs out).
+        """
+        _stats["calls"] += 1
+        loop = asyncio.get_running_loop()
+        give_up = None if budget is None else loop.time() + budget
+        for attempt in range(self.retry.attempts):
+            if give_up is not None:
+                timeout = min(timeout, max(0.0, give_up - loop.time()))
+            try:
+                return await asyncio.wait_for(fn(*args, **kwargs), timeout=timeout)
+            except Exception as e:
+                if attempt == self.retry.attempts - 1 or not is_transient(e):
+                    raise
+                delay = self.retry.delay(attempt)
+                if give_up is not None and loop.time() + delay >= give_up:
+                    raise
+                _stats["retries"] += 1
+                logger.warning(f"Qdrant {op} failed ({e!r}), retry {attempt + 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def query(self,
+                    collection_name: str,
+                    vector: Sequence[float],
+                    limit: int = 3,
+                    score_threshold: Optional[float] = None,
+                    with_payload: Any = True,
+                    query_filter: Optional[models.Filter] = None,
+                    search_params: Optional[models.SearchParams] = None,
+                    budget: Optional[float] = None) -> List[models.ScoredPoint]:
+        """Nearest-neighbour search through `query_points`, retries included within `budget` seconds."""
+        response = await self._call(
+            "query", self.timeouts.query, self.client.query_points,
+            budget=budget,
+            collection_name=collection_name,
+            query=list(vector),
+            limit=limit,
+            score_threshold=score_threshold,
+            with_payload=with_payload,
+            query_filter=query_filter,
+            search_params=search_params,
+        )
+        return response.points
+
+    async def upsert(self, collection_name: str, points: List[models.PointStruct], wait: bool = True):
+        return await self._call(
+            "upsert", self.timeouts.upsert, self.client.upsert,
+            collection_name=collection_name, points=points, wait=wait,
+        )
+
+    async def delete(self, collection_name: str, points_filter: models.Filter, wait: bool = True):
+        """Delete every point matching `points_filter`."""
+        return await self._call(
+            "delete", self.timeouts.upsert, self.client.delete,
+            collection_name=collection_name,
+            points_selector=models.FilterSelector(filter=points_filter),
+            wait=wait,
+        )
+
+    async def scroll(self,
+                     collection_name: str,
+                     limit: int = 1024,
+                     offset: Any = None,
+                     with_payload: Any = True,
+                     with_vectors: bool = False) -> Tuple[List[models.Record], Any]:
+        """One page of points; pass the returned offset back in for the next page (None when done)."""
+        return await self._call(
+            "scroll", self.timeouts.upsert, self.client.scroll,
+            collection_name=collection_name,
+            limit=limit,
+            offset=offset,
+            with_payload=with_payload,
+            with_vectors=with_vectors,
+        )
+
+    async def count(self, collection_name: str, exact: bool = True) -> int:
+        """Number of points; `exact` counts them instead of using Qdrant's estimate."""
+        response = await self._call(
+            "count", self.timeouts.upsert, self.client.count,
+            collection_name=collection_name, exact=exact,
+        )
+        return response.count
+
+    async def get_collection(self, collection_name: str) -> models.CollectionInfo:
+        return await self._call(
+            "get_collection", self.timeouts.admin, self.client.get_collection,
+            collection_name=collection_name,
+        )
+
+    async def collection_exists(self, collection_name: str) -> bool:
+        return await self._call(
+            "collection_exists", self.timeouts.admin, self.client.collection_exists,
+            collection_name=collection_name,
+        )
+
+    async def ensure_collection(self,
+                                collection_name: str,
+                                vector_dim: int,
+                                distance: models.Distance = models.Distance.DOT,
+                                profile: Optional[CollectionProfile] = None,
+                                **create_kwargs) -> bool:
+        """
+        Create the collection if it doesn't exist, configured by `profile` when given.
+        Returns True if it was created.
+        """
+        if await self.collection_exists(collection_name):
+            return False
+        if profile is not None:
+            vectors_config = profile.vector_params(vector_dim, distance)
+            create_kwargs = {**profile.create_kwargs(), **create_kwargs}
+        else:
+            vectors_config = models.VectorParams(size=vector_dim, distance=distance)
+        await self._call(
+            "create_collection", self.timeouts.admin, self.client.create_collection,
+            collection_name=collection_name,
+            vectors_config=vectors_config,
+            **create_kwargs,
+        )
+        return True
+
+    async def finalize_collection(self, collection_name: str, profile: CollectionProfile):
+        """Apply the profile's serving config after ingestion (builds a deferred HNSW index)."""
+        await self.update_collection(collection_name, **profile.finalize_kwargs())
+
+    async def wait_until_indexed(self, collection_name: str, timeout: float = 3600.0, poll: float = 1.0):
+        """Block until Qdrant reports the collection green (optimizations/indexing finished)."""
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            info = await self.get_collection(collection_name)
+            if info.status == models.CollectionStatus.GREEN:
+                return info
+            if asyncio.get_running_loop().time() > deadline:
+                raise TimeoutError(f"Collection '{collection_name}' still {info.status} after {timeout}s")
+            await asyncio.sleep(poll)
+
+    async def ensure_payload_indexes(self,
+                                     collection_name: str,
+                                     fields: Sequence[str] = PAYLOAD_INDEX_FIELDS,
+                                     field_schema: models.PayloadSchemaType = models.PayloadSchemaType.KEYWORD):
+        """Create payload indexes (keyword by default) so filters on these fields use the index."""
+        for field in fields:
+            await self._call(
+                "create_payload_index", self.timeouts.admin, self.client.create_payload_index,
+                collection_name=collection_name,
+                field_name=field,
+                field_schema=field_schema,
+            )
+
+    async def update_collection(self, collection_name: str, **kwargs):
+        return await self._call(
+            "update_collection", self.timeouts.admin, self.client.update_collection,
+            collection_name=collection_name, **kwargs,
+        )
+
+
+_stores: Dict[Tuple[str, bool], QdrantStore] = {}
+
+
+def get_store(url: Optional[str] = None, prefer_grpc: bool = True) -> QdrantStore:
+    """Shared store per URL, so callers don't each configure their own."""
+    key = (url or DEFAULT_QDRANT_URL, prefer_grpc)
+    if key not in _stores:
+        _stores[key] = QdrantStore(url=key[0], prefer_grpc=prefer_grpc)
+    return _stores[key]
+
+
+# Background loop for sync callers, started on first use.
+_sync_loop: Optional[asyncio.AbstractEventLoop] = None
+_sync_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _sync_loop
+    with _sync_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name="qdrant-store", daemon=True).start()
+    return _sync_loop
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """Run a store coroutine from sync code, reusing the same loop (and client) every time."""
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
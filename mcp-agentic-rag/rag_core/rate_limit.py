@@ -0,0 +1,232 @@
+"""
+Adaptive rate control for outbound HTTP (the Firecrawl API and crawled pages).
+
+Every upstream key (e.g. "firecrawl", or a page's domain) gets an `AdaptiveLimiter`:
+
+- a token bucket caps the request rate (politeness, and the API's quota),
+- a concurrency window is adjusted AIMD-style: +1 per window of fast successes, halved on
+  a 429, a 5xx, a connection error/timeout, or latency above the target,
+- a `Retry-After` on a 429/503 pauses the whole key until then.
+
+`RateController.request` wraps a `requests.Session` call with all of that and retries
+throttled requests (honouring Retry-After, else with jittered backoff). Waiting blocks
+the calling thread, so async code calls it through `asyncio.to_thread` like any other
+`requests` call. A `budget` bounds a whole `request` call, waits and retries included.
+"""
+import email.utils
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_STATUSES = (429, 503)
+
+
+@dataclass(frozen=True)
+class LimitConfig:
+    rate: float = 5.0  # requests per second
+    burst: int = 5
+    max_concurrency: int = 8
+    initial_concurrency: Optional[int] = None
+    # Successes slower than this shrink the window too; None disables it
+    latency_target: Optional[float] = None
+    max_retries: int = 3
+    # Longer Retry-After values are not waited out; the throttled response is returned
+    max_retry_after: float = 30.0
+    base_backoff: float = 0.5
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket; `acquire` reserves a token and sleeps until it is due. With a
+    `timeout`, a token due later than that is handed back and `acquire` returns False.
+    """
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            if timeout is not None and wait > timeout:
+                self._tokens += 1
+                return False
+        if wait:
+            time.sleep(wait)
+        return True
+
+
+class AdaptiveLimiter:
+    def __init__(self, config: LimitConfig):
+        self.config = config
+        self.bucket = TokenBucket(config.rate, config.burst)
+        self.limit = float(config.initial_concurrency or config.max_concurrency)
+        self.inflight = 0
+        self.blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self.stats = {"requests": 0, "throttled": 0, "errors": 0, "retries": 0, "decreases": 0}
+
+    def acquire(self, retry: bool = False, timeout: Optional[float] = None) -> bool:
+        """Wait for a request slot; False if none is free within `timeout` seconds."""
+        give_up = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = self.blocked_until - now
+                if wait <= 0 and self.inflight < int(self.limit):
+                    break
+                if give_up is not None:
+                    if now >= give_up or wait >= give_up - now:
+                        return False
+                    wait = give_up - now if wait <= 0 else wait
+                self._cond.wait(timeout=wait if wait > 0 else None)
+            self.inflight += 1
+            self.stats["retries" if retry else "requests"] += 1
+        if not self.bucket.acquire(None if give_up is None else give_up - time.monotonic()):
+            with self._cond:
+                self.inflight -= 1
+                self._cond.notify_all()
+            return False
+        return True
+
+    def _decrease(self, now: float, latency: float):
+        # Responses to requests sent before the last decrease don't count again
+        if now - self._last_decrease < latency:
+            return
+        self._last_decrease = now
+        self.limit = max(1.0, self.limit / 2)
+        self.stats["decreases"] += 1
+
+    def release(self,
+                latency: float,
+                overloaded: bool = False,
+                retry_after: Optional[float] = None,
+                counter: Optional[str] = None):
+        """Record a finished request. `overloaded`: throttled, 5xx or connection failure."""
+        with self._cond:
+            now = time.monotonic()
+            self.inflight -= 1
+            if counter is not None:
+                self.stats[counter] += 1
+            slow = self.config.latency_target is not None and latency > self.config.latency_target
+            if overloaded or slow:
+                self._decrease(now, latency)
+            else:
+                self.limit = min(float(self.config.max_concurrency), self.limit + 1 / self.limit)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict:
+        with self._cond:
+            return {**self.stats, "limit": round(self.limit, 2), "inflight": self.inflight}
+
+
+def domain_of(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+class RateController:
+    """`AdaptiveLimiter`s by key; `overrides` sets per-key limits, `default` everything else."""
+    def __init__(self, default: LimitConfig = LimitConfig(), overrides: Optional[Dict[str, LimitConfig]] = None):
+        self.default = default
+        self.overrides = overrides or {}
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, key: str) -> AdaptiveLimiter:
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = AdaptiveLimiter(self.overrides.get(key, self.default))
+                self._limiters[key] = limiter
+            return limiter
+
+    def request(self,
+                session: requests.Session,
+                method: str,
+                url: str,
+                key: Optional[str] = None,
+                budget: Optional[float] = None,
+                **kwargs) -> requests.Response:
+        """
+        `session.request` under the limits of `key` (default: the URL's domain). Throttled
+        responses are retried; the last one is returned if retries (or the `budget`) run
+        out. With a `budget` in seconds, the request timeout is capped to what is left of it
+        and `requests.exceptions.Timeout` is raised if no request slot frees up in time.
+        """
+        key = key or domain_of(url)
+        limiter = self.limiter(key)
+        config = limiter.config
+        give_up = None if budget is None else time.monotonic() + budget
+        for attempt in range(config.max_retries + 1):
+            left = None if give_up is None else give_up - time.monotonic()
+            if not limiter.acquire(retry=attempt > 0, timeout=left):
+                raise requests.exceptions.Timeout(f"{key}: no request slot within the {budget:.1f}s budget")
+            if give_up is not None:
+                left = max(0.01, give_up - time.monotonic())
+                kwargs["timeout"] = min(kwargs.get("timeout") or left, left)
+            start = time.monotonic()
+            # The slot is given back whatever happens; `outcome` is what gets recorded
+            outcome = {"counter": "errors"}
+            try:
+                response = session.request(method, url, **kwargs)
+                if response.status_code in THROTTLE_STATUSES:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if retry_after is None:
+                        # Full jitter, as for Qdrant retries
+                        retry_after = random.uniform(0, config.base_backoff * 2 ** attempt)
+                    outcome = {
+                        "overloaded": True, "retry_after": min(retry_after, config.max_retry_after), "counter": "throttled"
+                    }
+                else:
+                    outcome = {"overloaded": response.status_code >= 500}
+            except requests.exceptions.RequestException:
+                # Timeouts and connection failures are the server's; other errors (a malformed
+                # URL, ...) don't shrink the window
+                outcome["overloaded"] = True
+                raise
+            finally:
+                limiter.release(time.monotonic() - start, **outcome)
+
+            if response.status_code in THROTTLE_STATUSES:
+                out_of_budget = give_up is not None and time.monotonic() + retry_after >= give_up
+                if attempt == config.max_retries or retry_after > config.max_retry_after or out_of_budget:
+                    return response
+                logger.info(f"{key} answered {response.status_code}, retrying in {retry_after:.2f}s")
+                continue
+            return response
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {key: limiter.snapshot() for key, limiter in limiters.items()}
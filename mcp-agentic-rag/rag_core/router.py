@@ -0,0 +1,118 @@
+"""
+Cheap local tool router used for speculative retrieval in the client.
+
+It mirrors the routing rules the system prompt gives the LLM: questions with a clear
+COVID/pandemic signal go to the Covid FAQ tool, everything else goes to web search. The
+guess is only used to start the tool call early; the LLM still makes the real decision.
+"""
+import asyncio
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Dict, Iterable, Optional, Tuple
+
+from rag_core.single_flight import normalize_query
+
+FAQ_TOOL = "covid_faq_retrieval_tool"
+WEB_TOOL = "firecrawl_web_search_tool"
+
+COVID_KEYWORDS = (
+    "covid", "coronavirus", "sars-cov-2", "sars cov 2", "pandemic", "epidemic", "vaccine",
+    "vaccination", "booster", "omicron", "delta variant", "variant", "quarantine", "lockdown",
+    "mask", "pcr", "antigen test", "long covid", "covid faq", "social distancing", "ventilator",
+)
+
+_WORD_RE = re.compile(r"[a-z0-9\-]+")
+
+
+class KeywordRouter:
+    """Predicts (tool name, arguments) for a user query from keywords."""
+    def __init__(self, keywords: Iterable[str] = COVID_KEYWORDS, available_tools: Optional[Iterable[str]] = None):
+        self.keywords = tuple(k.lower() for k in keywords)
+        self.available_tools = set(available_tools) if available_tools is not None else None
+
+    def predict(self, query: str) -> Optional[Tuple[str, Dict[str, str]]]:
+        text = " ".join(_WORD_RE.findall(query.lower()))
+        tool = FAQ_TOOL if any(k in text for k in self.keywords) else WEB_TOOL
+        if self.available_tools is not None and tool not in self.available_tools:
+            return None
+        return tool, {"query": query}
+
+
+def same_call(predicted: Tuple[str, Dict], name: str, args: Dict) -> bool:
+    """True if the LLM's tool call can be answered by the prefetched one."""
+    predicted_name, predicted_args = predicted
+    if predicted_name != name or set(predicted_args) != set(args):
+        return False
+    return all(
+        normalize_query(str(args[k])) == normalize_query(str(v)) for k, v in predicted_args.items()
+    )
+
+
+@dataclass
+class SpeculationStats:
+    """How often the router guessed right and how much tool latency it hid."""
+    attempts: int = 0
+    hits: int = 0
+    misses: int = 0
+    saved_seconds: float = 0.0
+    wasted_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.attempts if self.attempts else 0.0
+
+    def __str__(self) -> str:
+        return (f"speculative retrieval: {self.hits}/{self.attempts} correct ({self.hit_rate:.0%}), "
+                f"saved {self.saved_seconds:.2f}s, wasted {self.wasted_seconds:.2f}s of tool time")
+
+
+class Speculation:
+    """
+    A predicted tool call started ahead of the LLM's decision. `take` hands out its result
+    when the LLM asks for the same call; `close` cancels it if it was never used.
+    """
+    def __init__(self, prediction: Tuple[str, Dict], call: Awaitable[Any], stats: SpeculationStats):
+        self.prediction = prediction
+        self.stats = stats
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.used = False
+        self.task = asyncio.ensure_future(self._run(call))
+        stats.attempts += 1
+
+    async def _run(self, call: Awaitable[Any]) -> Any:
+        try:
+            return await call
+        finally:
+            self.finished = time.perf_counter()
+
+    async def take(self, name: str, args: Dict) -> Optional[Any]:
+        """The prefetched result if it matches the requested call, else None."""
+        if self.used or not same_call(self.prediction, name, args):
+            return None
+        self.used = True
+        waiting_since = time.perf_counter()
+        try:
+            result = await self.task
+        except Exception:
+            # Caller falls back to making the call itself
+            self.stats.misses += 1
+            return None
+        # Tool time that overlapped the LLM call instead of following it
+        self.stats.hits += 1
+        self.stats.saved_seconds += (self.finished - self.started) - (time.perf_counter() - waiting_since)
+        return result
+
+    def close(self):
+        if self.used:
+            return
+        self.used = True
+        self.stats.misses += 1
+        if self.task.done():
+            self.stats.wasted_seconds += self.finished - self.started
+            if not self.task.cancelled():
+                self.task.exception()  # retrieved, so it isn't reported as unhandled
+        else:
+            self.stats.wasted_seconds += time.perf_counter() - self.started
+            self.task.cancel()
@@ -0,0 +1,100 @@
+"""
+Request coalescing (single-flight) with a short-TTL result cache.
+
+Concurrent calls for the same key share one in-flight upstream call. Results are kept for
+`ttl` seconds, and failures for `negative_ttl` seconds (the same exception is re-raised),
+so a burst of identical requests during an upstream outage doesn't hammer it either.
+Exceptions of the `uncached_errors` types (e.g. timeouts) are not cached.
+
+The shared call runs as its own task. A caller's `timeout` only bounds how long that
+caller waits for it, so one caller's short deadline neither cancels the call for the
+others nor ends up in the cache.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a free-text query: case, whitespace and trailing punctuation don't matter."""
+    return " ".join(query.lower().split()).strip(" ?!.")
+
+
+class SingleFlightCache:
+    """
+    Async single-flight + TTL cache. Counters: `upstream` (real calls), `coalesced`
+    (joined an in-flight call), `cached` (served from the cache, errors included).
+    """
+    def __init__(self,
+                 ttl: float = 300.0,
+                 negative_ttl: float = 10.0,
+                 max_entries: int = 1024,
+                 uncached_errors: Tuple[Type[BaseException], ...] = ()):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.uncached_errors = uncached_errors
+        # key -> (expires_at, is_error, value or exception)
+        self._cache: Dict[str, Tuple[float, bool, Any]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {"upstream": 0, "coalesced": 0, "cached": 0, "errors": 0}
+
+    def _lookup(self, key: str) -> Optional[Tuple[bool, Any]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, is_error, value = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+        return is_error, value
+
+    def _store(self, key: str, is_error: bool, value: Any):
+        if len(self._cache) >= self.max_entries:
+            # Evict expired entries first, then the oldest
+            now = time.monotonic()
+            for k in [k for k, (exp, _, _) in self._cache.items() if exp < now]:
+                del self._cache[k]
+            while len(self._cache) >= self.max_entries:
+                del self._cache[next(iter(self._cache))]
+        ttl = self.negative_ttl if is_error else self.ttl
+        self._cache[key] = (time.monotonic() + ttl, is_error, value)
+
+    async def _fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await fetch()
+        except Exception as e:
+            self.stats["errors"] += 1
+            if not isinstance(e, self.uncached_errors):
+                self._store(key, True, e)
+            raise
+        else:
+            self._store(key, False, value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    async def get(self, key: str, fetch: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """
+        Cached value for `key`, else the result of the shared `fetch()` call. Raises
+        `asyncio.TimeoutError` if this caller's `timeout` runs out first.
+        """
+        hit = self._lookup(key)
+        if hit is not None:
+            self.stats["cached"] += 1
+            is_error, value = hit
+            if is_error:
+                raise value
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["upstream"] += 1
+            inflight = asyncio.ensure_future(self._fetch(key, fetch))
+            self._inflight[key] = inflight
+            # Retrieve the outcome so a call every waiter gave up on doesn't log "exception never retrieved"
+            inflight.add_done_callback(lambda task: task.cancelled() or task.exception())
+        # shield: one waiter timing out or being cancelled must not cancel the shared call
+        return await asyncio.wait_for(asyncio.shield(inflight), timeout)
@@ -0,0 +1,205 @@
+"""
+Portable, versioned collection snapshots for fast bootstrap.
+
+A snapshot is a directory holding everything needed to rebuild a collection without
+re-embedding the corpus:
+
+    manifest.json    format version, collection, vector size/distance, point count,
+                     created-at, and the embedding-model fingerprint (name, dimension
+                     and the embeddings of a few fixed probe texts)
+    vectors.npy      float32 [n, dim], loaded memory-mapped on restore
+    ids.json         point IDs, row-aligned with vectors.npy
+    payloads.jsonl   one payload per line, row-aligned with vectors.npy
+    doc_store.db     (optional) copy of the local doc store
+
+The format only uses scroll/upsert, so it restores into a server Qdrant as well as the
+local (embedded / in-memory) backend. Restore refuses a snapshot whose embedding model
+doesn't match the one the caller will query with: a different name or dimension, or probe
+embeddings that point elsewhere. The probes are compared by cosine similarity, not exactly,
+since the same model gives slightly different floats on other hardware or BLAS builds.
+"""
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from qdrant_client import models
+
+from rag_core.profiles import CollectionProfile
+from rag_core.qdrant_store import QdrantStore
+
+FORMAT_VERSION = 1
+DOC_STORE_FILE = "doc_store.db"
+
+# Fixed probe texts: the embeddings of these identify the model weights, not just its name
+_PROBES = [
+    "What are the symptoms of COVID-19?",
+    "The quick brown fox jumps over the lazy dog.",
+    "search_query: vaccine efficacy",
+]
+
+
+# Every probe embedding must be at least this similar to the snapshot's
+MIN_PROBE_COSINE = 0.999
+
+
+class ModelMismatchError(RuntimeError):
+    """The snapshot was embedded with a different model than the one in use."""
+
+
+def model_fingerprint(embed_model, model_name: str) -> Dict:
+    """Name, dimension and the embeddings of the probe texts."""
+    vectors = np.asarray(embed_model.get_text_embedding_batch(_PROBES), dtype=np.float32)
+    return {"model": model_name, "dim": int(vectors.shape[1]), "probes": vectors.tolist()}
+
+
+def _describe(fingerprint: Dict) -> str:
+    return f"{fingerprint.get('model')} (dim {fingerprint.get('dim')})"
+
+
+def check_fingerprint(expected: Dict, actual: Dict):
+    """Raise `ModelMismatchError` unless `actual` is the model `expected` was made with."""
+    for key in ("model", "dim"):
+        if key in expected and key in actual and expected[key] != actual[key]:
+            raise ModelMismatchError(
+                f"Snapshot was built with {_describe(expected)}, but the current embedding model is "
+                f"{_describe(actual)} ('{key}' differs). Re-embed the corpus or use the matching model."
+            )
+    if "probes" not in expected or "probes" not in actual:
+        return
+    want = np.asarray(expected["probes"], dtype=np.float32)
+    got = np.asarray(actual["probes"], dtype=np.float32)
+    if want.shape == got.shape:
+        norms = np.linalg.norm(want, axis=1) * np.linalg.norm(got, axis=1)
+        similarity = float((np.sum(want * got, axis=1) / np.where(norms == 0, 1, norms)).min())
+    else:
+        similarity = 0.0
+    if similarity < MIN_PROBE_COSINE:
+        raise ModelMismatchError(
+            f"Snapshot was built with {_describe(expected)}, whose probe embeddings differ from the "
+            f"current model's (cosine {similarity:.4f} < {MIN_PROBE_COSINE}). Re-embed the corpus "
+            f"or use the matching model."
+        )
+
+
+def read_manifest(snapshot_dir: str) -> Dict:
+    with open(os.path.join(snapshot_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format {manifest.get('format_version')}, expected {FORMAT_VERSION}.")
+    return manifest
+
+
+async def export_collection(store: QdrantStore,
+                            collection_name: str,
+                            out_dir: str,
+                            fingerprint: Dict,
+                            doc_store_path: Optional[str] = None,
+                            page_size: int = 1024) -> str:
+    """Write a snapshot of `collection_name` to `out_dir/<collection>/<version>/` and return its path."""
+    info = await store.get_collection(collection_name)
+    params = info.config.params.vectors
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    snapshot_dir = os.path.join(out_dir, collection_name, version)
+    os.makedirs(snapshot_dir)
+
+    # points_count is only an estimate
+    total = await store.count(collection_name, exact=True)
+    vectors = np.lib.format.open_memmap(
+        os.path.join(snapshot_dir, "vectors.npy"), mode="w+", dtype=np.float32, shape=(total, params.size)
+    )
+    ids: List = []
+    row = 0
+    offset = None
+    with open(os.path.join(snapshot_dir, "payloads.jsonl"), "w", encoding="utf-8") as payloads:
+        while True:
+            records, offset = await store.scroll(
+                collection_name, limit=page_size, offset=offset, with_payload=True, with_vectors=True
+            )
+            for record in records:
+                if row >= total:
+                    raise RuntimeError("Collection grew during export; stop ingestion and retry.")
+                vectors[row] = record.vector
+                ids.append(record.id)
+                payloads.write(json.dumps(record.payload or {}) + "\n")
+                row += 1
+            if offset is None:
+                break
+    vectors.flush()
+    del vectors
+    if row != total:
+        raise RuntimeError(f"Exported {row} points but the collection reported {total}.")
+
+    with open(os.path.join(snapshot_dir, "ids.json"), "w", encoding="utf-8") as f:
+        json.dump(ids, f)
+    if doc_store_path:
+        copy_sqlite(doc_store_path, os.path.join(snapshot_dir, DOC_STORE_FILE))
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "version": version,
+        "collection": collection_name,
+        "points": row,
+        "vector_size": params.size,
+        "distance": params.distance.value if hasattr(params.distance, "value") else str(params.distance),
+        "embedding_model": fingerprint,
+        "has_doc_store": bool(doc_store_path),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    with open(os.path.join(snapshot_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return snapshot_dir
+
+
+def copy_sqlite(src: str, dst: str):
+    """
+    Copy the sqlite database `src` to `dst` with sqlite's online backup. Unlike a file copy
+    it includes commits still in `src`'s WAL, and writes `dst` through sqlite, so a
+    database open there (and its -wal/-shm files) stays consistent.
+    """
+    with closing(sqlite3.connect(src)) as source, closing(sqlite3.connect(dst)) as target:
+        source.backup(target)
+
+
+async def restore_collection(store: QdrantStore,
+                             snapshot_dir: str,
+                             profile: CollectionProfile,
+                             fingerprint: Optional[Dict] = None,
+                             collection_name: Optional[str] = None,
+                             doc_store_path: Optional[str] = None,
+                             batch_size: int = 1024) -> Dict:
+    """
+    Rebuild a collection from a snapshot: bulk upsert with HNSW deferred, then build the
+    index once. `fingerprint` is the model the caller will query with; it must match.
+    """
+    manifest = read_manifest(snapshot_dir)
+    if fingerprint is not None:
+        check_fingerprint(manifest["embedding_model"], fingerprint)
+    collection_name = collection_name or manifest["collection"]
+    if await store.collection_exists(collection_name):
+        raise FileExistsError(f"Collection '{collection_name}' already exists; restore needs a fresh one.")
+
+    vectors = np.load(os.path.join(snapshot_dir, "vectors.npy"), mmap_mode="r")
+    with open(os.path.join(snapshot_dir, "ids.json"), encoding="utf-8") as f:
+        ids = json.load(f)
+
+    await store.ensure_collection(
+        collection_name, manifest["vector_size"], distance=models.Distance(manifest["distance"]), profile=profile.bulk()
+    )
+    await store.ensure_payload_indexes(collection_name)
+    with open(os.path.join(snapshot_dir, "payloads.jsonl"), encoding="utf-8") as payloads:
+        for start in range(0, len(ids), batch_size):
+            end = min(start + batch_size, len(ids))
+            points = [
+                models.PointStruct(id=ids[i], vector=vectors[i].tolist(), payload=json.loads(next(payloads)))
+                for i in range(start, end)
+            ]
+            await store.upsert(collection_name, points, wait=True)
+    await store.finalize_collection(collection_name, profile)
+
+    if manifest.get("has_doc_store") and doc_store_path:
+        copy_sqlite(os.path.join(snapshot_dir, DOC_STORE_FILE), doc_store_path)
+    return manifest
@@ -0,0 +1,194 @@
+"""
+Write-through vector cache of live web results.
+
+Pages fetched by the web tool are stored as passages in a Qdrant collection ("web-cache"
+by default), one point per passage with `url`, `context` (the passage text) and
+`fetch_time` (epoch seconds) in the payload. Before crawling, the tool searches that
+collection: if a passage fetched within the TTL scores at least `min_score` against the
+query, the cached passages answer the question and the live crawl is skipped.
+
+Writes happen in the background, after the tool has answered. At most `max_writes` of them
+run at once (embedding in a worker thread) and at most `max_pending_writes` are held at
+all; past that a write is dropped, the pages are simply not cached.
+
+Staleness is enforced at query time by a `fetch_time` range filter, so an expired entry
+is never served. Deleting expired points is left to a background sweep that runs every
+`sweep_interval` seconds on the server's event loop.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence
+
+from qdrant_client import models
+
+from rag_core.passages import ScoredPassage
+from rag_core.qdrant_store import QdrantStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COLLECTION = "web-cache"
+
+
+class WebCache:
+    def __init__(self,
+                 store: QdrantStore,
+                 collection_name: str = DEFAULT_COLLECTION,
+                 ttl: float = 86400.0,
+                 min_score: float = 0.75,
+                 sweep_interval: float = 600.0,
+                 limit: int = 10,
+                 max_writes: int = 2,
+                 max_pending_writes: int = 8):
+        self.store = store
+        self.collection_name = collection_name
+        self.ttl = ttl
+        # Cosine similarity the best cached passage needs for the crawl to be skipped
+        self.min_score = min_score
+        self.sweep_interval = sweep_interval
+        self.limit = limit
+        self._ready = False
+        self._ensure_lock = asyncio.Lock()
+        self._sweeper: Optional[asyncio.Task] = None
+        # Background writes, kept referenced until they finish; at most `max_writes` run
+        self._pending = set()
+        self.max_pending_writes = max_pending_writes
+        self._write_slots = asyncio.Semaphore(max_writes)
+        self.stats = {
+            "hits": 0, "misses": 0, "pages_written": 0, "passages_written": 0, "writes_dropped": 0, "expired_sweeps": 0
+        }
+
+    def _fresh_filter(self, now: float) -> models.Filter:
+        return models.Filter(must=[models.FieldCondition(key="fetch_time", range=models.Range(gte=now - self.ttl))])
+
+    async def _exists(self) -> bool:
+        if not self._ready:
+            self._ready = await self.store.collection_exists(self.collection_name)
+        return self._ready
+
+    async def _ensure(self, vector_dim: int):
+        # Concurrent first writes would otherwise both try to create the collection
+        async with self._ensure_lock:
+            if self._ready:
+                return
+            # Cosine, so `min_score` means the same whatever the embedding model's norms are
+            await self.store.ensure_collection(self.collection_name, vector_dim, distance=models.Distance.COSINE)
+            await self.store.ensure_payload_indexes(self.collection_name, ("url",))
+            await self.store.ensure_payload_indexes(
+                self.collection_name, ("fetch_time",), field_schema=models.PayloadSchemaType.FLOAT
+            )
+            self._ready = True
+
+    async def lookup(self,
+                     query_vector: Sequence[float],
+                     char_budget: int,
+                     budget: Optional[float] = None) -> List[ScoredPassage]:
+        """
+        Fresh cached passages scoring at least `min_score`, best first, within `char_budget`
+        characters. Empty on a miss (nothing fresh and close enough, no cache yet, or Qdrant
+        unavailable or slower than `budget` seconds).
+        """
+        self.start_sweeper()
+        hits = []
+        try:
+            if await self._exists():
+                hits = await self.store.query(
+                    self.collection_name,
+                    query_vector,
+                    limit=self.limit,
+                    score_threshold=self.min_score,
+                    with_payload=["url", "context"],
+                    query_filter=self._fresh_filter(time.time()),
+                    budget=budget,
+                )
+        except Exception as e:
+            # The cache is an optimisation; a failing lookup means a live crawl
+            logger.warning(f"Web cache lookup failed: {e!r}")
+        selected: List[ScoredPassage] = []
+        remaining = char_budget
+        for hit in hits:
+            text = hit.payload["context"]
+            if len(text) > remaining:
+                continue
+            selected.append(ScoredPassage(hit.payload["url"], text, hit.score))
+            remaining -= len(text)
+        self.stats["hits" if selected else "misses"] += 1
+        return selected
+
+    async def put(self, pages: Dict[str, List[str]], embed_model):
+        """Embed the passages of freshly fetched `pages` ({url: passages}) and store them."""
+        pages = {url: passages for url, passages in pages.items() if passages}
+        if not pages:
+            return
+        texts = [text for passages in pages.values() for text in passages]
+        vectors = await asyncio.to_thread(embed_model.get_text_embedding_batch, texts, show_progress_bar=False)
+        await self._ensure(len(vectors[0]))
+
+        # A page's previous passages go first, its new version may have fewer of them
+        await self.store.delete(
+            self.collection_name,
+            models.Filter(must=[models.FieldCondition(key="url", match=models.MatchAny(any=list(pages)))]),
+        )
+        fetch_time = time.time()
+        points = []
+        vector_iter = iter(vectors)
+        for url, passages in pages.items():
+            for i, text in enumerate(passages):
+                points.append(models.PointStruct(
+                    id=str(uuid.uuid5(uuid.NAMESPACE_URL, f"{url}#{i}")),
+                    vector=list(next(vector_iter)),
+                    payload={"url": url, "context": text, "fetch_time": fetch_time},
+                ))
+        await self.store.upsert(self.collection_name, points)
+        self.stats["pages_written"] += len(pages)
+        self.stats["passages_written"] += len(points)
+
+    async def _put_when_free(self, pages: Dict[str, List[str]], embed_model):
+        async with self._write_slots:
+            await self.put(pages, embed_model)
+
+    def put_in_background(self, pages: Dict[str, List[str]], embed_model):
+        """
+        `put` without making the caller wait for it; failures are only logged. Dropped when
+        `max_pending_writes` writes are already waiting or running.
+        """
+        if not any(pages.values()):
+            return
+        if len(self._pending) >= self.max_pending_writes:
+            self.stats["writes_dropped"] += 1
+            logger.info(f"Web cache write of {len(pages)} pages dropped, {len(self._pending)} writes pending")
+            return
+        task = asyncio.create_task(self._put_when_free(pages, embed_model))
+        self._pending.add(task)
+        task.add_done_callback(self._write_done)
+
+    def _write_done(self, task: asyncio.Task):
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Web cache write failed: {task.exception()!r}")
+
+    async def sweep(self):
+        """Delete every passage fetched longer than `ttl` ago."""
+        if not await self._exists():
+            return
+        await self.store.delete(
+            self.collection_name,
+            models.Filter(must=[
+                models.FieldCondition(key="fetch_time", range=models.Range(lt=time.time() - self.ttl))
+            ]),
+        )
+        self.stats["expired_sweeps"] += 1
+
+    async def _sweep_forever(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.warning(f"Web cache sweep failed: {e!r}")
+            await asyncio.sleep(self.sweep_interval)
+
+    def start_sweeper(self):
+        """Start the expiry sweep on the running event loop, once."""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_forever())
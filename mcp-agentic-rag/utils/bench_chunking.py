@@ -0,0 +1,55 @@
+# Benchmark the token-window chunker against llama-index's TokenTextSplitter (chunks/s).
+# Uses the covid corpus if present, otherwise a synthetic one.
+#
+#   python bench_chunking.py [corpus_dir]
+
+import os
+import random
+import sys
+import time
+
+from llama_index.core.node_parser import TokenTextSplitter
+
+# rag_core lives one level up, next to mcp_server.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_core.chunker import Chunker
+from rag_core.loader import iter_documents
+
+corpus_dir = sys.argv[1] if len(sys.argv) > 1 else "./../../covid_data"
+CHUNK_SIZE = 200
+CHUNK_OVERLAP = 30
+WORKERS = os.cpu_count()
+
+
+def synthetic_corpus(n_docs: int = 200, words_per_doc: int = 20_000):
+    vocab = ["virus", "vaccine", "transmission", "symptom", "patient", "study", "variant",
+             "immune", "response", "clinical", "trial", "infection", "the", "of", "and", "in"]
+    docs = []
+    for _ in range(n_docs):
+        words = [random.choice(vocab) for _ in range(words_per_doc)]
+        for i in range(12, words_per_doc, random.randint(12, 30)):
+            words[i] += "."
+        docs.append(" ".join(words))
+    return docs
+
+
+def bench(label, fn, texts):
+    start = time.perf_counter()
+    n_chunks = fn(texts)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {n_chunks:>8} chunks {elapsed:>8.2f}s {n_chunks / elapsed:>10.0f} chunks/s")
+
+
+if __name__ == "__main__":
+    if os.path.isdir(corpus_dir):
+        texts = [doc["document"] for doc in iter_documents(corpus_dir, skip_unchanged=False)]
+    else:
+        texts = synthetic_corpus()
+    print(f"{len(texts)} documents, {sum(map(len, texts)) / 1e6:.1f}M characters")
+
+    splitter = TokenTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    chunker = Chunker(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+    bench("TokenTextSplitter", lambda ts: sum(len(splitter.split_text(t)) for t in ts), texts)
+    bench("Chunker (1 process)", lambda ts: sum(len(c) for c in chunker.chunk_many(ts, workers=1)), texts)
+    bench(f"Chunker ({WORKERS} processes)", lambda ts: sum(len(c) for c in chunker.chunk_many(ts, workers=WORKERS)), texts)
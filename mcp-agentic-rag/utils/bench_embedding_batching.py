@@ -0,0 +1,88 @@
+# Benchmark length-bucketed, token-budgeted embedding batches (rag_core/batching.py) against
+# fixed-size batches in corpus order, on a synthetic corpus of mixed-length texts.
+#
+#   python bench_embedding_batching.py [n_texts] [--padding-only]
+#
+# --padding-only skips the model and only reports how many padded tokens each strategy
+# would compute.
+
+import random
+import os
+import sys
+import time
+
+import numpy as np
+
+# rag_core lives one level up, next to mcp_server.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_core.batching import BucketedEmbedder, padded_tokens, plan_batches
+from rag_core.compression import count_tokens
+
+embed_model_name: str = "nomic-ai/nomic-embed-text-v1.5"
+args = [a for a in sys.argv[1:] if not a.startswith("--")]
+n_texts = int(args[0]) if args else 2000
+padding_only = "--padding-only" in sys.argv
+FIXED_BATCH_SIZES = [16, 64]
+TOKEN_BUDGETS = [4096, 8192, 16384]
+
+
+def mixed_length_corpus(n: int):
+    """Mostly short texts (FAQ answers, chunk tails) with a long tail of long ones."""
+    vocab = ["virus", "vaccine", "transmission", "symptom", "patient", "study", "variant",
+             "immune", "response", "clinical", "trial", "infection", "the", "of", "and", "in"]
+    rng = random.Random(0)
+    texts = []
+    for _ in range(n):
+        n_words = min(int(rng.lognormvariate(3.5, 1.0)) + 3, 1500)
+        texts.append(" ".join(rng.choice(vocab) for _ in range(n_words)))
+    return texts
+
+
+def fixed_batches(n: int, size: int):
+    return [list(range(i, min(i + size, n))) for i in range(0, n, size)]
+
+
+def main():
+    texts = mixed_length_corpus(n_texts)
+    lengths = [count_tokens(t) for t in texts]
+    total = sum(lengths)
+    print(f"{n_texts} texts, {total} tokens, lengths p50 {int(np.median(lengths))} / max {max(lengths)}")
+
+    print(f"\n{'strategy':<26} {'batches':>8} {'padded tokens':>14} {'efficiency':>11}")
+    for size in FIXED_BATCH_SIZES:
+        batches = fixed_batches(n_texts, size)
+        padded = padded_tokens(lengths, batches)
+        print(f"{f'fixed {size}, corpus order':<26} {len(batches):>8} {padded:>14} {total / padded:>11.0%}")
+    for budget in TOKEN_BUDGETS:
+        batches = plan_batches(lengths, budget)
+        padded = padded_tokens(lengths, batches)
+        print(f"{f'bucketed, {budget} tokens':<26} {len(batches):>8} {padded:>14} {total / padded:>11.0%}")
+    if padding_only:
+        return
+
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    embed_model = HuggingFaceEmbedding(model_name=embed_model_name, trust_remote_code=True)
+    embed_model.get_text_embedding_batch(texts[:8])  # warm-up
+
+    print(f"\n{'strategy':<26} {'seconds':>8} {'texts/s':>9} {'tokens/s':>10}")
+    reference = None
+    for size in FIXED_BATCH_SIZES:
+        embed_model.embed_batch_size = size
+        start = time.perf_counter()
+        vectors = embed_model.get_text_embedding_batch(texts, show_progress_bar=False)
+        elapsed = time.perf_counter() - start
+        reference = np.asarray(vectors) if reference is None else reference
+        print(f"{f'fixed {size}, corpus order':<26} {elapsed:>8.1f} {n_texts / elapsed:>9.1f} {total / elapsed:>10.0f}")
+    for budget in TOKEN_BUDGETS:
+        embedder = BucketedEmbedder(embed_model, token_budget=budget)
+        start = time.perf_counter()
+        vectors = embedder.get_text_embedding_batch(texts, lengths=lengths, show_progress_bar=False)
+        elapsed = time.perf_counter() - start
+        # Same vectors, same order (up to padding-induced float noise)
+        assert np.allclose(np.asarray(vectors), reference, atol=1e-3)
+        print(f"{f'bucketed, {budget} tokens':<26} {elapsed:>8.1f} {n_texts / elapsed:>9.1f} {total / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
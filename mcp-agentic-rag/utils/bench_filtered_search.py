@@ -0,0 +1,82 @@
+# Benchmark filtered vs unfiltered search latency as the corpus grows.
+# Filters use the keyword payload indexes created at ingestion time.
+#
+#   python bench_filtered_search.py                      # Qdrant on localhost
+#   python bench_filtered_search.py :memory:             # in-process stand-in (no payload indexes)
+
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+from qdrant_client import models
+
+# rag_core lives one level up, next to mcp_server.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_core.qdrant_store import build_filter, get_store
+
+qdrant_url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:6333"
+collection_name = "bench-filtered"
+vector_dim = 768  # nomic-embed-text-v1.5
+corpus_sizes = [1_000, 10_000, 50_000]
+n_sources = 200
+n_queries = 100
+upload_batch = 512
+
+
+def random_vector():
+    return [random.gauss(0, 1) for _ in range(vector_dim)]
+
+
+def percentile(samples, p):
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * p))]
+
+
+async def timed_queries(store, query_filter):
+    latencies = []
+    for _ in range(n_queries):
+        start = time.perf_counter()
+        await store.query(collection_name, random_vector(), limit=3, with_payload=False, query_filter=query_filter)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def main():
+    store = get_store(qdrant_url)
+    if await store.collection_exists(collection_name):
+        await store.client.delete_collection(collection_name)
+    await store.ensure_collection(collection_name, vector_dim)
+    await store.ensure_payload_indexes(collection_name)
+
+    sources = [f"doc_{i}.pdf" for i in range(n_sources)]
+    loaded = 0
+    print(f"{'points':>8} {'filter':>12} {'p50 ms':>8} {'p95 ms':>8}")
+    for size in corpus_sizes:
+        while loaded < size:
+            n = min(upload_batch, size - loaded)
+            points = [
+                models.PointStruct(
+                    id=str(uuid.uuid4()),
+                    vector=random_vector(),
+                    payload={"source": random.choice(sources), "doc_type": "pdf", "ingest_date": "2025-01-01"},
+                )
+                for _ in range(n)
+            ]
+            await store.upsert(collection_name, points)
+            loaded += n
+
+        for label, query_filter in (
+            ("none", None),
+            ("1 source", build_filter(sources=sources[:1])),
+            ("10 sources", build_filter(sources=sources[:10])),
+        ):
+            latencies = await timed_queries(store, query_filter)
+            print(f"{size:>8} {label:>12} {statistics.median(latencies):>8.2f} {percentile(latencies, 0.95):>8.2f}")
+
+    await store.client.delete_collection(collection_name)
+
+
+asyncio.run(main())
@@ -0,0 +1,90 @@
+# Compare collection profiles (see rag_core/profiles.py) on ingest time, index build time,
+# Qdrant memory and query latency. Needs a real Qdrant (the in-memory one has no HNSW).
+#
+#   python bench_profiles.py [qdrant_url] [n_points]
+
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+import requests
+from qdrant_client import models
+
+# rag_core lives one level up, next to mcp_server.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_core.profiles import PROFILES
+from rag_core.qdrant_store import get_store
+
+qdrant_url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:6333"
+n_points = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+vector_dim = 768  # nomic-embed-text-v1.5
+upload_batch = 512
+n_queries = 200
+# "ram" as-is vs. the same profile loaded in bulk mode, plus the on-disk profile
+profiles = [PROFILES["ram"], PROFILES["bulk"], PROFILES["disk"].bulk()]
+
+
+def random_vector():
+    return [random.gauss(0, 1) for _ in range(vector_dim)]
+
+
+def qdrant_resident_mb() -> float:
+    """Qdrant's resident memory from its Prometheus /metrics endpoint (REST port)."""
+    try:
+        metrics = requests.get(f"{qdrant_url.rstrip('/')}/metrics", timeout=5).text
+    except requests.exceptions.RequestException:
+        return float("nan")
+    for line in metrics.splitlines():
+        if line.startswith("memory_resident_bytes"):
+            return float(line.split()[-1]) / 1e6
+    return float("nan")
+
+
+async def bench(profile):
+    store = get_store(qdrant_url)
+    bulk_suffix = "-bulk" if profile.defer_index and profile.name != "bulk" else ""
+    name = f"bench-profile-{profile.name}{bulk_suffix}"
+    if await store.collection_exists(name):
+        await store.client.delete_collection(name)
+    await store.ensure_collection(name, vector_dim, profile=profile)
+
+    start = time.perf_counter()
+    for i in range(0, n_points, upload_batch):
+        points = [
+            models.PointStruct(id=str(uuid.uuid4()), vector=random_vector(), payload={"source": "bench"})
+            for _ in range(min(upload_batch, n_points - i))
+        ]
+        await store.upsert(name, points, wait=False)
+    ingest_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await store.finalize_collection(name, profile)
+    await asyncio.sleep(1)  # let the optimizer pick up the config change
+    await store.wait_until_indexed(name)
+    index_s = time.perf_counter() - start
+    memory_mb = qdrant_resident_mb()
+
+    latencies = []
+    for _ in range(n_queries):
+        t = time.perf_counter()
+        await store.query(name, random_vector(), limit=3, with_payload=False, search_params=profile.search_params())
+        latencies.append((time.perf_counter() - t) * 1000)
+    latencies.sort()
+
+    await store.client.delete_collection(name)
+    return name, ingest_s, index_s, memory_mb, statistics.median(latencies), latencies[int(len(latencies) * 0.95)]
+
+
+async def main():
+    print(f"{n_points} points of dim {vector_dim}")
+    print(f"{'collection':<28} {'ingest s':>9} {'index s':>8} {'qdrant MB':>10} {'p50 ms':>7} {'p95 ms':>7}")
+    for profile in profiles:
+        name, ingest_s, index_s, memory_mb, p50, p95 = await bench(profile)
+        print(f"{name:<28} {ingest_s:>9.1f} {index_s:>8.1f} {memory_mb:>10.0f} {p50:>7.2f} {p95:>7.2f}")
+
+
+asyncio.run(main())
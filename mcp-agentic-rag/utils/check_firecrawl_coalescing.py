@@ -0,0 +1,71 @@
+# Check that concurrent identical Firecrawl searches are coalesced into one upstream call
+# and that repeats are served from the cache, against the local fake Firecrawl server.
+
+import asyncio
+import os
+import sys
+
+import requests
+
+# rag_core lives one level up, next to mcp_server.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_core.firecrawl import FirecrawlClient
+from fake_firecrawl import FakeFirecrawl
+
+N_CONCURRENT = 25
+
+
+async def main():
+    fake = FakeFirecrawl(search_latency=0.3).start()
+    client = FirecrawlClient(fake.search_url, api_key="test", cache_ttl=60)
+    try:
+        # Same question, written slightly differently by each "user"
+        queries = [f"  Who won the last FIFA World Cup{'?' * (i % 2)}" for i in range(N_CONCURRENT)]
+        results = await asyncio.gather(*[client.search(q) for q in queries])
+        assert all(r == results[0] for r in results)
+        await client.search("who won the last fifa world cup")
+        await client.search("a different question")
+    finally:
+        fake.stop()
+
+    stats = client.stats()
+    print(f"Client counters: {stats}")
+    print(f"Fake Firecrawl saw: {fake.counts}")
+    assert stats == {"upstream": 2, "coalesced": N_CONCURRENT - 1, "cached": 1, "errors": 0}
+    assert fake.counts["search"] == 2
+
+    # Errors are cached too (briefly), so an outage isn't hit by every retrying caller
+    down = FirecrawlClient(fake.search_url, api_key="test", timeout=1, negative_ttl=60)
+    for _ in range(3):
+        try:
+            await down.search("anything")
+        except requests.exceptions.RequestException:
+            pass
+    print(f"Client counters with Firecrawl down: {down.stats()}")
+    assert down.stats() == {"upstream": 1, "coalesced": 0, "cached": 2, "errors": 1}
+
+    # A caller's budget only bounds its own wait: the search still completes for a
+    # concurrent caller with more time, and the timeout is not cached for later callers
+    fake = FakeFirecrawl(search_latency=0.3).start()
+    slow = FirecrawlClient(fake.search_url, api_key="test", negative_ttl=60)
+    try:
+        short, patient = await asyncio.gather(
+            slow.search("budgeted question", budget=0.1),
+            slow.search("budgeted question", budget=30),
+            return_exceptions=True,
+        )
+        assert isinstance(short, requests.exceptions.Timeout), short
+        assert isinstance(patient, list) and patient
+        try:
+            await slow.search("another budgeted question", budget=0.1)
+        except requests.exceptions.Timeout:
+            pass
+        assert await slow.search("another budgeted question", budget=30)
+    finally:
+        fake.stop()
+    print(f"Client counters with budgets: {slow.stats()}")
+    assert slow.stats()["errors"] == 0 and fake.counts["search"] == 2
+    print("Coalescing and caching OK")
+
+
+asyncio.run(main())
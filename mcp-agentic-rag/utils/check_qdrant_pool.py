@@ -0,0 +1,57 @@
+# Check that the shared Qdrant store reuses one client (channel) per event loop.
+# Runs against an in-memory Qdrant stand-in by default, or a real one with
+# `python check_qdrant_pool.py http://localhost:6333`.
+
+import asyncio
+import os
+import random
+import sys
+import uuid
+
+from qdrant_client import models
+
+# rag_core lives one level up, next to mcp_server.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_core import qdrant_store
+from rag_core.qdrant_store import get_store, run_sync
+
+qdrant_url = sys.argv[1] if len(sys.argv) > 1 else qdrant_store.IN_MEMORY
+collection_name = "pool-check"
+vector_dim = 32
+n_points = 500
+n_queries = 200
+
+
+def random_vector():
+    return [random.random() for _ in range(vector_dim)]
+
+
+async def main():
+    store = get_store(qdrant_url)
+    await store.ensure_collection(collection_name, vector_dim)
+    points = [
+        models.PointStruct(id=str(uuid.uuid4()), vector=random_vector(), payload={"context": f"chunk {i}"})
+        for i in range(n_points)
+    ]
+    await store.upsert(collection_name, points)
+
+    results = await asyncio.gather(*[
+        store.query(collection_name, random_vector(), limit=3) for _ in range(n_queries)
+    ])
+    assert all(len(r) == 3 for r in results)
+    return qdrant_store.stats()
+
+
+async_stats = asyncio.run(main())
+print(f"Async path: {async_stats}")
+assert async_stats["clients_created"] == 1, "expected a single pooled client for the event loop"
+
+# Sync callers (FAQEngine, scripts) all share the background loop, so one more client at most.
+store = get_store(qdrant_url)
+run_sync(store.ensure_collection(collection_name, vector_dim))
+for _ in range(20):
+    run_sync(store.query(collection_name, random_vector(), limit=3))
+sync_stats = qdrant_store.stats()
+print(f"Sync path:  {sync_stats}")
+assert sync_stats["clients_created"] == 2, "expected the sync path to reuse its background client"
+print("Connection reuse OK")
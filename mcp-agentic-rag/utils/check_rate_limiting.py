@@ -0,0 +1,114 @@
+# Check the adaptive rate limiting (rag_core/rate_limit.py) against the local fake Firecrawl
+# server answering 429s: concurrency backs off to what the server accepts, Retry-After is
+# honoured, and every request eventually succeeds. Successes slower than the latency target
+# shrink the window too. A time budget stops a request from waiting past it.
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# rag_core lives one level up, next to mcp_server.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_core.rate_limit import LimitConfig, RateController, parse_retry_after
+from fake_firecrawl import FakeFirecrawl
+
+N_PAGES = 60
+
+
+def fetch_all(controller: RateController, base_url: str, workers: int = 16):
+    session = requests.Session()
+    with ThreadPoolExecutor(workers) as pool:
+        return list(pool.map(
+            lambda n: controller.request(session, "GET", f"{base_url}/page/{n}", timeout=5).status_code,
+            range(N_PAGES),
+        ))
+
+
+def main():
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0  # in the past
+    assert parse_retry_after("soon") is None
+
+    # Server accepts 4 requests at a time, the client starts out allowing 16
+    fake = FakeFirecrawl(page_latency=0.05, max_concurrent=4, retry_after=0.2).start()
+    controller = RateController(LimitConfig(rate=200, burst=20, max_concurrency=16, max_retries=10))
+    try:
+        start = time.perf_counter()
+        statuses = fetch_all(controller, fake.base_url)
+        elapsed = time.perf_counter() - start
+    finally:
+        fake.stop()
+    stats = controller.stats()[f"127.0.0.1:{fake.server.server_address[1]}"]
+    print(f"Concurrency cap: {N_PAGES} pages in {elapsed:.2f}s, server peak in-flight {fake.peak_inflight}, "
+          f"429s {fake.counts['throttled']}, limiter {stats}")
+    assert statuses == [200] * N_PAGES
+    assert stats["limit"] < 16 and stats["decreases"] >= 1
+
+    # Slow but successful upstream: no 429s at all, yet responses over the latency target
+    # halve the window
+    fake = FakeFirecrawl(page_latency=0.2).start()
+    controller = RateController(LimitConfig(rate=200, burst=20, max_concurrency=8, latency_target=0.1))
+    try:
+        statuses = fetch_all(controller, fake.base_url, workers=8)
+    finally:
+        fake.stop()
+    stats = controller.stats()[f"127.0.0.1:{fake.server.server_address[1]}"]
+    print(f"Latency target: 429s {fake.counts['throttled']}, limiter {stats}")
+    assert statuses == [200] * N_PAGES and fake.counts["throttled"] == 0
+    assert stats["limit"] < 8 and stats["decreases"] >= 1
+
+    # Every request throttled at first: Retry-After pauses the whole domain
+    fake = FakeFirecrawl(page_latency=0.0, throttle_rate=1.0, retry_after=0.5).start()
+    controller = RateController(LimitConfig(rate=100, burst=10, max_concurrency=4, max_retries=2))
+    session = requests.Session()
+    try:
+        start = time.perf_counter()
+
+        def stop_throttling():
+            time.sleep(0.3)
+            fake.throttle_rate = 0.0
+
+        with ThreadPoolExecutor(1) as pool:
+            pool.submit(stop_throttling)
+            status = controller.request(session, "GET", f"{fake.base_url}/page/1", timeout=5).status_code
+        waited = time.perf_counter() - start
+    finally:
+        fake.stop()
+    print(f"Retry-After: status {status} after {waited:.2f}s, server saw {fake.counts}")
+    assert status == 200 and waited >= 0.5
+
+    # Politeness: 1 request/s per domain, so 3 requests take about 2s
+    fake = FakeFirecrawl(page_latency=0.0).start()
+    controller = RateController(LimitConfig(rate=1, burst=1, max_concurrency=4))
+    try:
+        start = time.perf_counter()
+        statuses = [controller.request(session, "GET", f"{fake.base_url}/page/{n}").status_code for n in range(3)]
+        elapsed = time.perf_counter() - start
+    finally:
+        fake.stop()
+    print(f"Token bucket: 3 requests at 1/s took {elapsed:.2f}s")
+    assert statuses == [200] * 3 and 1.8 <= elapsed < 3
+
+    # Budget: the next 1/s token is ~1s away, a 0.3s budget gives up instead of waiting
+    fake = FakeFirecrawl(page_latency=0.0).start()
+    controller = RateController(LimitConfig(rate=1, burst=1, max_concurrency=4))
+    try:
+        controller.request(session, "GET", f"{fake.base_url}/page/1", budget=0.3)
+        start = time.perf_counter()
+        try:
+            controller.request(session, "GET", f"{fake.base_url}/page/2", budget=0.3)
+            timed_out = False
+        except requests.exceptions.Timeout:
+            timed_out = True
+        elapsed = time.perf_counter() - start
+    finally:
+        fake.stop()
+    print(f"Budget: second request within 0.3s timed out {timed_out} after {elapsed:.2f}s")
+    assert timed_out and elapsed < 0.2
+
+
+if __name__ == "__main__":
+    main()
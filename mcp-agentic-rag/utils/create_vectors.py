@@ -1,34 +1,40 @@
 # Utilize llama-index and qdrant to develop vectors out of your data.
 
-from llama_index.core.node_parser import TokenTextSplitter
-from llama_index.core import SimpleDirectoryReader
-from llama_index.core.schema import Document
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from qdrant_client import models, QdrantClient
+from qdrant_client import models
 from tqdm import tqdm
+import os
+import sys
 import uuid
 import re
 import unicodedata
 import gc
+from datetime import date
+
+# rag_core lives one level up, next to mcp_server.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_core.batching import BucketedEmbedder
+from rag_core.chunker import Chunker
+from rag_core.doc_store import open_doc_store
+from rag_core.embedding_service import BULK, open_embed_model
+from rag_core.embedding_store import chunk_hash, open_embedding_store
+from rag_core.loader import iter_documents
+from rag_core.profiles import get_profile
+from rag_core.profiling import profile_run
+from rag_core.qdrant_store import build_filter, get_store, run_sync
 
 
 # running qdrant in local mode suitable for experiments
 qdrant_url: str = "http://localhost:6333"
 collection_name: str = "covid-faq"
 embed_model_name: str = "nomic-ai/nomic-embed-text-v1.5"
-BATCH_SIZE = 16  # Tune this based on your memory/network
-
-
-# Setup outside the loops
-splitter = TokenTextSplitter(chunk_size=200, chunk_overlap=30)
+corpus_dir: str = "./../../covid_data"
+BATCH_SIZE = 16  # Points per upsert, tune this based on your memory/network
+EMBED_TOKEN_BUDGET = 8192  # Padded tokens per embedding batch, bounds the model's memory use
+LOADER_WORKERS = None  # PDF parsing processes, defaults to the number of CPUs
+LOADER_MAX_INFLIGHT_MB = 256  # Caps how much of the corpus is being parsed at once
+COLLECTION_PROFILE = os.getenv("COLLECTION_PROFILE", "ram")  # ram | disk | bulk, see rag_core/profiles.py
+BULK_LOAD = True  # Upload with HNSW disabled and build the index once at the end
 
-embed_model = HuggingFaceEmbedding(
-    model_name=embed_model_name,
-    trust_remote_code=True
-)
-vector_dim = len(embed_model.get_text_embedding("test"))
-
-client = QdrantClient(url=qdrant_url, prefer_grpc=True)
 
 def clean_text(text: str) -> str:
     text = re.sub(r'/uni[0-9A-Fa-f]+', ' ', text)
@@ -37,72 +43,135 @@ def clean_text(text: str) -> str:
     text = re.sub(r'\s+', ' ', text)
     return text.strip()
 
-# Prepare payload: list of dict with cleaned text and source
-reader = SimpleDirectoryReader(
-    input_dir="./../../covid_data",
-    num_files_limit=2)
-docs = reader.load_data()
-
-payload = [{"document": clean_text(doc.text), "source": getattr(doc, "file_path", "No file path")} for doc in docs]
 
-all_points = []
-
-for entry in tqdm(payload, desc="Processing documents"):
-    doc = Document(text=entry["document"], metadata={"source": entry["source"]})
-    chunks = splitter.split_text(doc.text)
-
-    try:
-        client.get_collection(collection_name=collection_name)
+def doc_type_of(source: str) -> str:
+    return os.path.splitext(source)[1].lstrip(".").lower() or "unknown"
+
+
+def main():
+    # Setup outside the loops; each document is tokenized once, in the loader workers
+    chunker = Chunker(chunk_size=200, chunk_overlap=30)
+
+    # Chunks are embedded in batches of similar length, sized by a token budget. Set
+    # EMBEDDING_SOCKET to embed through the shared embedding service (utils/embedding_sidecar.py)
+    # as bulk work, behind the servers' queries, instead of loading another copy of the model.
+    embed_model = BucketedEmbedder(
+        open_embed_model(embed_model_name, priority=BULK),
+        token_budget=EMBED_TOKEN_BUDGET,
+    )
+    vector_dim = len(embed_model.get_text_embedding("test"))
+
+    store = get_store(qdrant_url)
+    # Set DOC_STORE_PATH to keep chunk text in a local store instead of the Qdrant payload
+    # (the MCP server must then be started with the same DOC_STORE_PATH).
+    doc_store = open_doc_store(os.getenv("DOC_STORE_PATH"))
+    # Set EMBEDDING_STORE_DIR to also keep the vectors on disk: chunks embedded before are
+    # not embedded again, and utils/reindex.py can rebuild a collection without the model.
+    embedding_store = open_embedding_store(os.getenv("EMBEDDING_STORE_DIR"), embed_model_name)
+    ingest_date = date.today().isoformat()
+
+    profile = get_profile(COLLECTION_PROFILE)
+    if BULK_LOAD:
+        profile = profile.bulk()
+
+    created = run_sync(store.ensure_collection(collection_name, vector_dim, distance=models.Distance.DOT, profile=profile))
+    if created:
+        print(f"Created collection '{collection_name}'.")
+    else:
         print(f"Collection '{collection_name}' already exists. Skipping creation.")
-    except Exception:
-        print(f"Creating collection '{collection_name}'...")
-        client.create_collection(
-            collection_name=collection_name,
-            vectors_config=models.VectorParams(
-                size=vector_dim,
-                distance=models.Distance.DOT
-            )
-        )
-
-    # Process chunks in small batches - memory constraints lol
-    for i in range(0, len(chunks), BATCH_SIZE):
-        batch_chunks = chunks[i : i + BATCH_SIZE]
-        embeddings = embed_model.get_text_embedding_batch(batch_chunks, show_progress_bar=False)
-
-        all_points = []
-        for chunk_text, embedding in zip(batch_chunks, embeddings):
-            all_points.append(
-                models.PointStruct(
-                    id=str(uuid.uuid4()),
-                    vector=embedding,
-                    payload={"context": chunk_text, "source": entry["source"]},
-                )
+    run_sync(store.ensure_payload_indexes(collection_name))
+
+    # Documents stream in, already cleaned and chunked, as soon as they are parsed. Files
+    # unchanged since they were last ingested into this collection are skipped; a new
+    # (or recreated) collection has none of them yet, so everything is ingested.
+    documents = iter_documents(
+        corpus_dir,
+        target=f"{qdrant_url}/{collection_name}",
+        reset_manifest=created,
+        workers=LOADER_WORKERS,
+        max_inflight_bytes=LOADER_MAX_INFLIGHT_MB * 1024 * 1024,
+        preprocess=clean_text,
+        chunker=chunker,
+    )
+
+    for entry in tqdm(documents, desc="Processing documents"):
+        source = entry["source"]
+        chunks = entry["chunks"]
+        del entry
+
+        # A changed file replaces whatever was ingested for it before
+        run_sync(store.delete(collection_name, build_filter(sources=[source])))
+        if doc_store is not None:
+            # New chunks get new point IDs, the old rows would never be read again
+            doc_store.delete_sources([source])
+        if embedding_store is not None:
+            embedding_store.retire_source(source)
+
+        # Embed what isn't in the embedding store yet, the whole document at once
+        digests = [chunk_hash(chunk.text) for chunk in chunks]
+        stored = embedding_store.get(digests) if embedding_store is not None else {}
+        missing = [i for i, digest in enumerate(digests) if digest not in stored]
+        embeddings = [stored.get(digest) for digest in digests]
+        if missing:
+            computed = embed_model.get_text_embedding_batch(
+                [chunks[i].text for i in missing],
+                lengths=[chunks[i].token_end - chunks[i].token_start for i in missing],
+                show_progress_bar=False,
             )
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+        del stored
+
+        # Upload in small batches - memory constraints lol
+        for i in range(0, len(chunks), BATCH_SIZE):
+            batch_chunks = chunks[i : i + BATCH_SIZE]
+            batch_digests = digests[i : i + BATCH_SIZE]
+            batch_embeddings = embeddings[i : i + BATCH_SIZE]
 
-        if len(all_points) >= BATCH_SIZE:
-            client.upload_points(
-                collection_name=collection_name,
-                points=all_points,
-                wait=True
-            )
             all_points = []
+            ids = [str(uuid.uuid4()) for _ in batch_chunks]
+            if doc_store is not None:
+                doc_store.put_many((point_id, chunk.text, source) for point_id, chunk in zip(ids, batch_chunks))
+            for point_id, chunk, embedding in zip(ids, batch_chunks, batch_embeddings):
+                payload = {
+                    "source": source,
+                    "doc_type": doc_type_of(source),
+                    "ingest_date": ingest_date,
+                    # Character span of the chunk in the cleaned document text
+                    "char_start": chunk.char_start,
+                    "char_end": chunk.char_end,
+                }
+                if doc_store is None:
+                    payload["context"] = chunk.text
+                all_points.append(
+                    models.PointStruct(
+                        id=point_id,
+                        vector=list(map(float, embedding)),
+                        payload=payload,
+                    )
+                )
 
-        # Upload remaining points
-        if all_points:
-            client.upload_points(
-                collection_name=collection_name,
-                points=all_points,
-                wait=True
-            )
-        
-        # Now safe to clean up
-        del batch_chunks, embeddings, all_points
+            run_sync(store.upsert(collection_name, all_points, wait=True))
+            if embedding_store is not None:
+                embedding_store.add(ids, batch_digests, batch_embeddings, [point.payload for point in all_points])
+
+            # Now safe to clean up
+            del batch_chunks, batch_embeddings, all_points
+
+        del chunks, embeddings
         gc.collect()
 
-# Optimize collection after upload
-client.update_collection(
-    collection_name=collection_name,
-    optimizer_config=models.OptimizersConfigDiff(indexing_threshold=20000)
-)
+    if embedding_store is not None:
+        embedding_store.flush()
+
+    print(f"Embedding: {embed_model.stats}")
+
+    # Build the HNSW index (once, if it was deferred) now that everything is uploaded
+    run_sync(store.finalize_collection(collection_name, profile))
 
 
+# The loader uses a process pool, so the script body must not run again in its workers
+if __name__ == "__main__":
+    # With PROFILE_DIR set the whole run is profiled (main process only, not the parse workers)
+    with profile_run("create_vectors"):
+        main()
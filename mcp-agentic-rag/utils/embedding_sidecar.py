@@ -0,0 +1,59 @@
+# Run the shared embedding service (rag_core/embedding_service.py): one copy of the model
+# for every MCP server process and ingestion job on this machine.
+#
+#   python embedding_sidecar.py [--socket /tmp/mcp-rag-embeddings.sock] [--cores 0-3]
+#
+# Then start the servers, create_vectors.py and FAQEngine users with
+# EMBEDDING_SOCKET=<socket> and they embed through it instead of loading the model.
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+# rag_core lives one level up, next to mcp_server.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_core.embedding_service import DEFAULT_SOCKET, EmbeddingService, parse_cores, pin_to_cores
+
+embed_model_name: str = "nomic-ai/nomic-embed-text-v1.5"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--socket", default=os.getenv("EMBEDDING_SOCKET", DEFAULT_SOCKET))
+    parser.add_argument("--model", default=embed_model_name)
+    parser.add_argument("--cores", default=None, help="Cores for the model's threads, e.g. '0-3' (default: all)")
+    parser.add_argument("--max-batch-size", type=int, default=64, help="Texts per shared batch")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="How long a part-filled batch waits for more")
+    parser.add_argument("--token-budget", type=int, default=8192, help="Padded tokens per forward pass")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.cores:
+        # Before the model loads, so torch's worker threads start on these cores
+        pin_to_cores(parse_cores(args.cores))
+
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    embed_model = HuggingFaceEmbedding(model_name=args.model, trust_remote_code=True)
+    embed_model.get_text_embedding("warm-up")
+    service = EmbeddingService(
+        embed_model,
+        socket_path=args.socket,
+        model_name=args.model,
+        max_batch_size=args.max_batch_size,
+        max_wait=args.max_wait_ms / 1000,
+        token_budget=args.token_budget,
+    )
+    try:
+        await service.serve()
+    finally:
+        print(f"Embedding service stats: {service.stats}, {service.embedder.stats}")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
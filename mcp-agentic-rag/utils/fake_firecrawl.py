@@ -0,0 +1,142 @@
+# Local stand-in for the Firecrawl search API and the pages it points to.
+#
+#   POST /search        -> {"data": [{"url": ".../page/<n>", "title": ...}, ...]}
+#   GET  /page/<n>      -> a small HTML page
+#
+# To exercise rate limiting it can answer 429 (with Retry-After): a `throttle_rate` share of
+# requests at random, and every request beyond `max_concurrent` in flight.
+#
+# Run it standalone (`python fake_firecrawl.py 8765`) and set FIRECRAWL_URL=http://127.0.0.1:8765/search,
+# or start it in-process with `FakeFirecrawl().start()`.
+
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class FakeFirecrawl:
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 search_latency: float = 0.2,
+                 page_latency: float = 0.05,
+                 results_per_query: int = 3,
+                 throttle_rate: float = 0.0,
+                 max_concurrent: Optional[int] = None,
+                 retry_after: Optional[float] = 1.0):
+        self.search_latency = search_latency
+        self.page_latency = page_latency
+        self.results_per_query = results_per_query
+        self.throttle_rate = throttle_rate
+        self.max_concurrent = max_concurrent
+        self.retry_after = retry_after
+        self.counts = {"search": 0, "page": 0, "throttled": 0}
+        self.inflight = 0
+        self.peak_inflight = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def search_url(self) -> str:
+        return f"{self.base_url}/search"
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _admit(self) -> bool:
+        """Take an in-flight slot, or False if this request should get a 429."""
+        with self._lock:
+            if random.random() < self.throttle_rate or (
+                self.max_concurrent is not None and self.inflight >= self.max_concurrent
+            ):
+                self.counts["throttled"] += 1
+                return False
+            self.inflight += 1
+            self.peak_inflight = max(self.peak_inflight, self.inflight)
+            return True
+
+    def _done(self):
+        with self._lock:
+            self.inflight -= 1
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                if status == 429 and fake.retry_after is not None:
+                    self.send_header("Retry-After", f"{fake.retry_after:g}")
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                query = json.loads(self.rfile.read(length) or b"{}").get("query", "")
+                if not fake._admit():
+                    self._send(429, b'{"error": "rate limited"}', "application/json")
+                    return
+                fake._count("search")
+                try:
+                    time.sleep(fake.search_latency)
+                finally:
+                    fake._done()
+                data = [
+                    {"url": f"{fake.base_url}/page/{i}", "title": f"Result {i} for {query.strip()}"}
+                    for i in range(fake.results_per_query)
+                ]
+                self._send(200, json.dumps({"success": True, "data": data}).encode(), "application/json")
+
+            def do_GET(self):
+                if not self.path.startswith("/page/"):
+                    self._send(404, b"not found", "text/plain")
+                    return
+                if not fake._admit():
+                    self._send(429, b"rate limited", "text/plain")
+                    return
+                fake._count("page")
+                try:
+                    time.sleep(fake.page_latency)
+                finally:
+                    fake._done()
+                n = self.path.rsplit("/", 1)[-1]
+                html = (
+                    f"<html><head><script>var x = 1;</script></head><body>"
+                    f"<nav>Home | About | Contact</nav>"
+                    f"<p>This is page {n}. It contains a few sentences about the topic that was searched.</p>"
+                    f"</body></html>"
+                )
+                self._send(200, html.encode(), "text/html")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "FakeFirecrawl":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    fake = FakeFirecrawl(port=port)
+    print(f"Fake Firecrawl listening on {fake.search_url}")
+    fake.server.serve_forever()
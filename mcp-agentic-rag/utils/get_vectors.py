@@ -1,5 +1,11 @@
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from qdrant_client import models, QdrantClient
+import os
+import sys
+
+# rag_core lives one level up, next to mcp_server.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_core.doc_store import hit_payloads, open_doc_store
+from rag_core.qdrant_store import get_store, run_sync
 
 
 qdrant_url: str = "http://localhost:6333"
@@ -16,22 +22,24 @@ embed_model = HuggingFaceEmbedding(
 )
 vector_dim = len(embed_model.get_text_embedding("test"))
 
-client = QdrantClient(url=qdrant_url, prefer_grpc=True)
+store = get_store(qdrant_url)
+doc_store = open_doc_store(os.getenv("DOC_STORE_PATH"))
 
 query_embedding = embed_model.get_query_embedding(query)
 
 # Search Qdrant for the most similar vectors
-search_result = client.search(
-    collection_name=collection_name,
-    query_vector=query_embedding,
+search_result = run_sync(store.query(
+    collection_name,
+    query_embedding,
     limit=5, #top_k
-    score_threshold=0.5
-)
+    score_threshold=0.5,
+    with_payload=doc_store is None
+))
 
 if not search_result:
     print("I couldn't find a relevant answer in my knowledge base.")
 
 relevant_contexts = [
-    hit.payload["context"] for hit in search_result
+    payload["context"] for payload in hit_payloads(search_result, doc_store)
 ]
 print(relevant_contexts)
\ No newline at end of file
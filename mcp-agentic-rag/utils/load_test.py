@@ -0,0 +1,353 @@
+# Load test an MCP server with N concurrent sessions and a mix of FAQ / web-search calls.
+#
+#   python load_test.py --sessions 8 --duration 60 --faq-ratio 0.7
+#   python load_test.py --server ../clean-code/new_server.py --transport http --sessions 32
+#
+# Everything upstream is local: the fake Firecrawl server (fake_firecrawl.py) serves both
+# the search API and the crawled pages with configurable latency, and Qdrant runs embedded
+# in the server process from a seeded local directory. The embedding model is the real one.
+#
+# stdio starts one server process per session (how the client runs today); http starts a
+# single server with MCP_TRANSPORT=streamable-http and opens every session against it.
+# Load starts once every session is connected and runs for --duration seconds. Reports
+# throughput, a latency histogram per tool, error rates and server RSS/CPU over time.
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import AsyncExitStack
+
+import psutil
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+from qdrant_client import QdrantClient, models
+
+from fake_firecrawl import FakeFirecrawl
+
+UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+FAQ_TOOL = "covid_faq_retrieval_tool"
+WEB_TOOL = "firecrawl_web_search_tool"
+COLLECTION_NAME = "covid-faq"
+VECTOR_DIM = 768  # nomic-embed-text-v1.5
+
+FAQ_QUERIES = [
+    "What are the symptoms of COVID-19?",
+    "How long should I quarantine after a positive test?",
+    "Are vaccine boosters recommended for adults over {n}?",
+    "How does the omicron variant spread?",
+    "Can I travel {n} days after recovering from covid?",
+]
+WEB_QUERIES = [
+    "Who won the {n} FIFA World Cup?",
+    "Latest stock price of company number {n}",
+    "Weather forecast for city {n} this weekend",
+    "Best python web frameworks in {n}",
+]
+
+# Latency histogram bucket upper bounds, in seconds
+BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, math.inf]
+
+
+def seed_qdrant(path: str, n_points: int):
+    """Local (embedded) Qdrant at `path` with random unit vectors and FAQ-like payloads."""
+    client = QdrantClient(path=path)
+    client.create_collection(
+        COLLECTION_NAME, vectors_config=models.VectorParams(size=VECTOR_DIM, distance=models.Distance.DOT)
+    )
+    rng = random.Random(0)
+    for start in range(0, n_points, 256):
+        points = []
+        for i in range(start, min(start + 256, n_points)):
+            vector = [rng.gauss(0, 1) for _ in range(VECTOR_DIM)]
+            norm = math.sqrt(sum(v * v for v in vector))
+            points.append(models.PointStruct(
+                id=str(uuid.uuid4()),
+                vector=[v / norm for v in vector],
+                payload={"source": f"doc-{i % 50}.pdf", "doc_type": "pdf", "context": f"Seeded FAQ passage {i}. " * 20},
+            ))
+        client.upsert(COLLECTION_NAME, points)
+    client.close()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ResourceSampler:
+    """Samples RSS and CPU of every process this harness started (the servers)."""
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = []  # (elapsed s, processes, rss MB, cpu %)
+        self._procs = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self, started: float):
+        rss = cpu = 0.0
+        alive = 0
+        for child in psutil.Process().children(recursive=True):
+            proc = self._procs.setdefault(child.pid, child)
+            try:
+                rss += proc.memory_info().rss
+                cpu += proc.cpu_percent(None)  # since the previous sample of this process
+                alive += 1
+            except psutil.Error:
+                continue
+        self.samples.append((time.perf_counter() - started, alive, rss / 1e6, cpu))
+
+    def _run(self):
+        started = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            self._sample(started)
+
+    def start(self) -> "ResourceSampler":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class Results:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_kinds = defaultdict(int)
+
+    def record(self, tool: str, seconds: float, error: str = None):
+        self.latencies[tool].append(seconds)
+        if error is not None:
+            self.errors[tool] += 1
+            self.error_kinds[error[:80]] += 1
+
+
+def pick_call(rng: random.Random, faq_ratio: float):
+    n = rng.randint(1, 10_000)
+    if rng.random() < faq_ratio:
+        return FAQ_TOOL, {"query": rng.choice(FAQ_QUERIES).format(n=n)}
+    return WEB_TOOL, {"query": rng.choice(WEB_QUERIES).format(n=n)}
+
+
+class LoadWindow:
+    """Starts the measured load once every session has connected (or failed to)."""
+    def __init__(self, sessions: int, duration: float):
+        self.waiting = sessions
+        self.duration = duration
+        self.started = asyncio.Event()
+        self.start = self.deadline = None
+
+    def arrived(self):
+        self.waiting -= 1
+        if self.waiting == 0:
+            self.start = time.perf_counter()
+            self.deadline = self.start + self.duration
+            self.started.set()
+
+
+async def run_session(session_id: int, open_session, args, results: Results, window: LoadWindow):
+    rng = random.Random(session_id)
+    async with AsyncExitStack() as stack:
+        try:
+            session = await open_session(stack)
+            await session.initialize()
+        except Exception as e:
+            results.record("connect", 0.0, f"connect: {e!r}")
+            return
+        finally:
+            window.arrived()
+        await window.started.wait()
+        calls = 0
+        while time.perf_counter() < window.deadline and (args.calls is None or calls < args.calls):
+            tool, tool_args = pick_call(rng, args.faq_ratio)
+            start = time.perf_counter()
+            try:
+                response = await session.call_tool(tool, tool_args)
+                error = "tool error" if response.isError else None
+            except Exception as e:
+                error = repr(e)
+            results.record(tool, time.perf_counter() - start, error)
+            calls += 1
+            if args.think_time:
+                await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+
+async def wait_for_port(port: int, proc: subprocess.Popen, timeout: float = 120):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited with code {proc.returncode} before listening")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"Server did not listen on port {port} within {timeout}s")
+
+
+def histogram(latencies) -> str:
+    counts = [0] * len(BUCKETS)
+    for latency in latencies:
+        counts[next(i for i, bound in enumerate(BUCKETS) if latency <= bound)] += 1
+    widest = max(counts) or 1
+    lines = []
+    for bound, count in zip(BUCKETS, counts):
+        label = f"<= {bound:g}s" if bound != math.inf else f"> {BUCKETS[-2]:g}s"
+        lines.append(f"    {label:>9} {count:>6} {'#' * round(40 * count / widest)}")
+    return "\n".join(lines)
+
+
+def report(results: Results, sampler: ResourceSampler, elapsed: float) -> dict:
+    total = sum(len(v) for v in results.latencies.values())
+    errors = sum(results.errors.values())
+    print(f"\n{total} calls in {elapsed:.1f}s: {total / elapsed:.2f} calls/s, "
+          f"{errors} errors ({errors / max(total, 1):.1%})")
+    summary = {"elapsed_s": elapsed, "calls": total, "errors": errors, "tools": {}, "resources": sampler.samples}
+    for tool, latencies in sorted(results.latencies.items()):
+        ordered = sorted(latencies)
+        p = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        print(f"\n{tool}: {len(ordered)} calls, {results.errors[tool]} errors, "
+              f"p50 {p(0.5):.3f}s  p95 {p(0.95):.3f}s  p99 {p(0.99):.3f}s  max {ordered[-1]:.3f}s")
+        print(histogram(ordered))
+        summary["tools"][tool] = {
+            "calls": len(ordered), "errors": results.errors[tool], "mean_s": statistics.mean(ordered),
+            "p50_s": p(0.5), "p95_s": p(0.95), "p99_s": p(0.99), "max_s": ordered[-1],
+        }
+    if results.error_kinds:
+        print("\nerrors:")
+        for kind, count in sorted(results.error_kinds.items(), key=lambda kv: -kv[1]):
+            print(f"  {count:>6}  {kind}")
+
+    print(f"\n{'t s':>6} {'procs':>6} {'RSS MB':>8} {'CPU %':>7}")
+    for t, procs, rss, cpu in sampler.samples:
+        print(f"{t:>6.1f} {procs:>6} {rss:>8.0f} {cpu:>7.0f}")
+    return summary
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--server", default=os.path.join(UTILS_DIR, "..", "mcp_server.py"))
+    parser.add_argument("--transport", choices=["stdio", "http"], default="stdio")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load after all sessions started")
+    parser.add_argument("--calls", type=int, default=None, help="Stop each session after this many calls")
+    parser.add_argument("--faq-ratio", type=float, default=0.5, help="Share of FAQ calls, the rest are web searches")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between a session's calls (s)")
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--page-latency", type=float, default=0.1)
+    parser.add_argument("--results-per-query", type=int, default=3)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of upstream requests answered 429")
+    parser.add_argument("--web-cache", action="store_true",
+                        help="Keep the servers' web cache on (web calls may then skip the fake Firecrawl)")
+    parser.add_argument("--points", type=int, default=2000, help="Points seeded into the Qdrant collection")
+    parser.add_argument("--sample-interval", type=float, default=1.0)
+    parser.add_argument("--json", default=None, help="Also write the summary to this file")
+    parser.add_argument("--server-log", default=os.devnull, help="Where the servers' stderr goes")
+    args = parser.parse_args()
+
+    server = os.path.abspath(args.server)
+    fake = FakeFirecrawl(
+        search_latency=args.search_latency,
+        page_latency=args.page_latency,
+        results_per_query=args.results_per_query,
+        throttle_rate=args.throttle_rate,
+    ).start()
+    workdir = tempfile.mkdtemp(prefix="mcp-load-")
+    seeded = os.path.join(workdir, "qdrant-seed")
+    seed_qdrant(seeded, args.points)
+
+    env = {
+        **os.environ,
+        "FIRECRAWL_URL": fake.search_url,
+        "FIRECRAWL_API_KEY": "load-test",
+        # FastMCP validates these even in stdio mode
+        "HOST": os.getenv("HOST", "127.0.0.1"),
+        "PORT": os.getenv("PORT", "8000"),
+        "PYTHONUNBUFFERED": "1",
+    }
+    if not args.web_cache:
+        env["WEB_CACHE_TTL"] = "0"
+
+    def qdrant_copy(name: str) -> str:
+        # The embedded backend locks its directory, so every server process gets its own copy
+        path = os.path.join(workdir, name)
+        shutil.copytree(seeded, path)
+        return path
+
+    server_log = open(args.server_log, "a")
+    http_server = None
+    if args.transport == "http":
+        port = free_port()
+        http_server = subprocess.Popen(
+            [sys.executable, server],
+            cwd=os.path.dirname(server),
+            env={**env, "QDRANT_URL": qdrant_copy("qdrant-http"), "MCP_TRANSPORT": "streamable-http",
+                 "HOST": "127.0.0.1", "PORT": str(port)},
+            stderr=server_log,
+        )
+        await wait_for_port(port, http_server)
+
+        async def open_session(stack: AsyncExitStack, session_id: int) -> ClientSession:
+            read, write, _ = await stack.enter_async_context(streamablehttp_client(f"http://127.0.0.1:{port}/mcp"))
+            return await stack.enter_async_context(ClientSession(read, write))
+    else:
+        async def open_session(stack: AsyncExitStack, session_id: int) -> ClientSession:
+            params = StdioServerParameters(
+                command=sys.executable,
+                args=[server],
+                cwd=os.path.dirname(server),
+                env={**env, "QDRANT_URL": qdrant_copy(f"qdrant-{session_id}")},
+            )
+            read, write = await stack.enter_async_context(stdio_client(params, errlog=server_log))
+            return await stack.enter_async_context(ClientSession(read, write))
+
+    results = Results()
+    sampler = ResourceSampler(args.sample_interval).start()
+    print(f"{args.sessions} {args.transport} sessions against {server}, {args.faq_ratio:.0%} FAQ calls")
+    setup_start = time.perf_counter()
+    window = LoadWindow(args.sessions, args.duration)
+    try:
+        await asyncio.gather(*[
+            run_session(i, lambda stack, i=i: open_session(stack, i), args, results, window)
+            for i in range(args.sessions)
+        ])
+    finally:
+        sampler.stop()
+        end = time.perf_counter()
+        if http_server is not None:
+            http_server.terminate()
+            http_server.wait(timeout=30)
+        fake.stop()
+        server_log.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if window.start is None:
+        print("Load never started (interrupted while sessions were connecting)")
+        return
+    print(f"Sessions connected in {window.start - setup_start:.1f}s (RSS/CPU timeline includes startup)")
+    summary = report(results, sampler, end - window.start)
+    summary["upstream_requests"] = fake.counts
+    print(f"\nFake Firecrawl served: {fake.counts}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+# Rebuild a collection from the embedding store (rag_core/embedding_store.py) instead of
+# re-embedding the corpus, e.g. to change its name, distance or collection profile.
+#
+#   python reindex.py <new_collection> [--distance Cosine] [--profile disk]
+#   python reindex.py <new_collection> --backfill-from covid-faq
+#
+# --backfill-from first copies points the store doesn't have yet from an existing
+# collection (ingested before EMBEDDING_STORE_DIR was set); only those chunks are embedded.
+
+import argparse
+import asyncio
+import os
+import sys
+
+from qdrant_client import models
+
+# rag_core lives one level up, next to mcp_server.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_core.doc_store import open_doc_store
+from rag_core.embedding_service import BULK, open_embed_model
+from rag_core.embedding_store import EmbeddingStore, backfill_from_collection, rebuild_collection
+from rag_core.profiles import get_profile
+from rag_core.qdrant_store import get_store
+
+qdrant_url: str = "http://localhost:6333"
+embed_model_name: str = "nomic-ai/nomic-embed-text-v1.5"
+embedding_store_dir: str = os.getenv("EMBEDDING_STORE_DIR", "./../../embeddings")
+
+
+def embed_batch(texts):
+    # Loaded (or connected to the shared embedding service) only if something needs embedding
+    if not hasattr(embed_batch, "model"):
+        embed_batch.model = open_embed_model(embed_model_name, priority=BULK)
+    return embed_batch.model.get_text_embedding_batch(texts, show_progress_bar=False)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("collection", help="Collection to create; must not exist yet")
+    parser.add_argument("--qdrant-url", default=qdrant_url, help="Qdrant URL, or a path for the local backend")
+    parser.add_argument("--distance", default="Dot", choices=[d.value for d in models.Distance])
+    parser.add_argument("--profile", default=os.getenv("COLLECTION_PROFILE", "ram"))
+    parser.add_argument("--backfill-from", default=None, help="Existing collection to fill the store from first")
+    args = parser.parse_args()
+
+    store = get_store(args.qdrant_url)
+    embedding_store = EmbeddingStore(embedding_store_dir, embed_model_name)
+    if args.backfill_from:
+        counts = await backfill_from_collection(
+            store, embedding_store, args.backfill_from, embed_batch, doc_store=open_doc_store(os.getenv("DOC_STORE_PATH"))
+        )
+        print(f"Backfilled from '{args.backfill_from}': {counts}")
+
+    total = await rebuild_collection(
+        store, embedding_store, args.collection, get_profile(args.profile), distance=models.Distance(args.distance)
+    )
+    print(f"Built '{args.collection}' with {total} points from {embedding_store.dir}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
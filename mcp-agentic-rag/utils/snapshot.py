@@ -0,0 +1,71 @@
+# Export a collection to a versioned snapshot, or restore one into a fresh Qdrant / local backend.
+#
+#   python snapshot.py export [--collection covid-faq] [--out ./../../snapshots]
+#   python snapshot.py restore <snapshot_dir> [--qdrant-url http://localhost:6333 | ./qdrant_local]
+#
+# Both commands load the embedding model to fingerprint it: export records it, restore
+# refuses snapshots made with a different model.
+
+import argparse
+import asyncio
+import os
+import sys
+
+from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+# rag_core lives one level up, next to mcp_server.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_core.profiles import get_profile
+from rag_core.qdrant_store import get_store
+from rag_core.snapshots import export_collection, model_fingerprint, restore_collection
+
+qdrant_url: str = "http://localhost:6333"
+collection_name: str = "covid-faq"
+embed_model_name: str = "nomic-ai/nomic-embed-text-v1.5"
+snapshot_root: str = "./../../snapshots"
+
+
+def fingerprint():
+    embed_model = HuggingFaceEmbedding(
+        model_name=embed_model_name,
+        trust_remote_code=True
+    )
+    return model_fingerprint(embed_model, embed_model_name)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export")
+    export.add_argument("--qdrant-url", default=qdrant_url)
+    export.add_argument("--collection", default=collection_name)
+    export.add_argument("--out", default=snapshot_root)
+
+    restore = sub.add_parser("restore")
+    restore.add_argument("snapshot_dir")
+    restore.add_argument("--qdrant-url", default=qdrant_url, help="Qdrant URL, or a path for the local backend")
+    restore.add_argument("--collection", default=None, help="Defaults to the snapshot's collection name")
+    restore.add_argument("--profile", default=os.getenv("COLLECTION_PROFILE", "ram"))
+    args = parser.parse_args()
+
+    # Snapshots carry the doc store too when DOC_STORE_PATH is in use
+    doc_store_path = os.getenv("DOC_STORE_PATH")
+    store = get_store(args.qdrant_url)
+    if args.command == "export":
+        path = await export_collection(store, args.collection, args.out, fingerprint(), doc_store_path=doc_store_path)
+        print(f"Snapshot written to {path}")
+    else:
+        manifest = await restore_collection(
+            store,
+            args.snapshot_dir,
+            get_profile(args.profile),
+            fingerprint=fingerprint(),
+            collection_name=args.collection,
+            doc_store_path=doc_store_path,
+        )
+        print(f"Restored {manifest['points']} points of '{manifest['collection']}' (version {manifest['version']})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,7 +4,11 @@ import os
 import requests
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-import time
+import sys
+
+# rag_core lives one level up, next to mcp_server.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_core.rate_limit import LimitConfig, RateController
 
 # Load environment variables
 load_dotenv()
@@ -12,6 +16,10 @@ load_dotenv()
 url = os.getenv("FIRECRAWL_URL")
 api_key = os.getenv('FIRECRAWL_API_KEY')
 
+# One request per second per domain (and the Firecrawl API), backing off on 429s
+limits = RateController(default=LimitConfig(rate=1.0, burst=1, max_concurrency=1))
+session = requests.Session()
+
 query = """
 What is the meaning of life?
 """
@@ -23,7 +31,7 @@ headers = {
 }
 
 try:
-    response = requests.post(url, json=payload, headers=headers)
+    response = limits.request(session, "POST", url, key="firecrawl", json=payload, headers=headers, timeout=65)
     response.raise_for_status()
     results = response.json().get("data", [])
 except requests.exceptions.RequestException as e:
@@ -33,7 +41,7 @@ except requests.exceptions.RequestException as e:
 
 def crawl_and_extract_text(target_url: str) -> str:
     try:
-        r = requests.get(target_url, timeout=10)
+        r = limits.request(session, "GET", target_url, timeout=10)
         r.raise_for_status()
         soup = BeautifulSoup(r.text, "html.parser")
 
@@ -58,5 +66,5 @@ for i, item in enumerate(results):
     extracted_text = crawl_and_extract_text(page_url)
     print(f"\nExtracted Text:\n{extracted_text[:1000]}...")
 
-    time.sleep(1)
+print(f"\nRequest limits: {limits.stats()}")
 